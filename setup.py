@@ -42,12 +42,16 @@ setup(
     include_package_data=True,
     install_requires=[
         'setuptools',
-        'sqlalchemy',
+        # PgSQLInspector uses the dialect internals of SQLAlchemy 1.3
+        'sqlalchemy<1.4',
         'pyyaml',
         'six',
     ],
     extras_require=dict(
         test=tests_requires,
+        asyncpg=['asyncpg'],
+        aiomysql=['aiomysql'],
+        msgpack=['msgpack'],
     ),
     test_suite='nose.collector',
     tests_require=tests_requires,
@@ -56,5 +60,14 @@ setup(
        schemadump = schema2rst.commands.dump:main
        schema2rst = schema2rst.commands.rst:main
        schema2graph = schema2rst.commands.graph:main
+       schemabatch = schema2rst.commands.batch:main
+       schemabench = schema2rst.commands.bench:main
+
+       [schema2rst.inspectors]
+       mysqldb = schema2rst.inspectors.mysql:MySQLInspector
+       pymysql = schema2rst.inspectors.mysql:MySQLInspector
+       psycopg2 = schema2rst.inspectors.pgsql:PgSQLInspector
+       asyncpg = schema2rst.inspectors.aio:AsyncPgSQLInspector
+       aiomysql = schema2rst.inspectors.aio:AsyncMySQLInspector
     """,
 )
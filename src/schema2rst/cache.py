@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import io
+import os
+import json
+import time
+import hashlib
+from schema2rst import models
+
+DEFAULT_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                                 os.path.expanduser('~/.cache'), 'schema2rst')
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class DumpCache(object):
+    """On-disk cache of dump() results
+
+    Entries are JSON files keyed by the engine URL (without credentials)
+    and the schema name. An entry expires *ttl* seconds after it was
+    written (its mtime); the least recently used entries (by atime) are
+    evicted while the cache exceeds *max_size* bytes.
+    """
+    def __init__(self, ttl, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.ttl = ttl
+        self.directory = directory or DEFAULT_DIRECTORY
+        self.max_size = max_size
+
+    @staticmethod
+    def make_key(url, schema, tables=None, collapse=False):
+        # credentials are not a part of the key
+        key = '%s|%s|%s|%s|%r|%s' % (url.drivername, url.host, url.port,
+                                     url.database, sorted(url.query.items()),
+                                     schema)
+        if tables:
+            key += '|%r' % (tables,)
+        if collapse:
+            key += '|collapse'
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, '%s.json' % key)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            mtime = os.stat(path).st_mtime
+            if time.time() - mtime > self.ttl:
+                return None
+
+            with io.open(path, encoding='utf-8') as f:
+                schema = json.load(f)
+
+            os.utime(path, (time.time(), mtime))  # mark as recently used
+            return schema
+        except (IOError, OSError, ValueError):
+            return None
+
+    def put(self, key, schema):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        path = self.path(key)
+        tmppath = '%s.%d.tmp' % (path, os.getpid())
+        with io.open(tmppath, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(schema, default=models.serializable,
+                               ensure_ascii=False))
+        os.replace(tmppath, path)
+
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime > self.ttl:
+                    os.remove(path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+            except OSError:
+                pass
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def dump(self, inspector, *args, refresh=False, **kwargs):
+        """Returns the cached dump of *inspector*, reflecting on a miss
+
+        With *refresh*, the database is always reflected and the cache
+        entry is replaced.
+        """
+        key = self.make_key(inspector.engine.url, inspector.schema_name,
+                            inspector.tables, inspector.collapse)
+        schema = None if refresh else self.get(key)
+        if schema is None:
+            schema = inspector.dump(*args, **kwargs)
+            self.put(key, schema)
+
+        return schema
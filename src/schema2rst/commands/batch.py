@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import io
+import os
+import sys
+import glob
+import time
+import yaml
+import optparse
+from concurrent import futures
+from schema2rst import inspectors, serializers
+from schema2rst.commands import rst
+
+
+def parse_option(args):
+    usage = 'Usage: schemabatch [options] CONFIG_FILE_OR_DIR ...'
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option('-o', '--output-dir', action='store', default='.',
+                      help='directory to write docs of each database into')
+    parser.add_option('-p', '--processes', action='store', type='int',
+                      default=os.cpu_count(),
+                      help='number of databases to document in parallel')
+    parser.add_option('-j', '--jobs', action='store', type='int', default=1,
+                      help='number of tables to reflect concurrently')
+
+    options, args = parser.parse_args(args)
+    if options.jobs < 1:
+        parser.error('--jobs (-j) must be a positive number')
+
+    if options.processes < 1:
+        parser.error('--processes (-p) must be a positive number')
+
+    if not args:
+        parser.error('config files or directories are required')
+
+    try:
+        options.configs = load_configs(args)
+    except (IOError, ValueError) as exc:
+        parser.error(str(exc))
+
+    return options, args
+
+
+def load_configs(paths):
+    """Returns (name, config) pairs of databases listed in *paths*
+
+    A path is a config file, a file holding a list of configs, or a
+    directory whose *.yaml files are read. Configs in a list are named by
+    their 'name' (or 'db') entry, others by their file name. Raises
+    ValueError if an entry has neither.
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(glob.glob(os.path.join(path, '*.yaml'))))
+        else:
+            filenames.append(path)
+
+    configs = []
+    for filename in filenames:
+        config = yaml.safe_load(io.open(filename, encoding='utf-8'))
+        if isinstance(config, list):
+            for number, entry in enumerate(config, 1):
+                if not isinstance(entry, dict):
+                    raise ValueError('%s: entry %d is not a config' %
+                                     (filename, number))
+                elif not (entry.get('name') or entry.get('db')):
+                    raise ValueError('%s: entry %d has neither name nor db' %
+                                     (filename, number))
+
+                configs.append((entry.get('name') or entry['db'], entry))
+        else:
+            name = os.path.splitext(os.path.basename(filename))[0]
+            configs.append((name, config))
+
+    return configs
+
+
+def document(name, config, outdir, jobs=1):
+    """Writes the YAML dump and RST docs of a database into outdir/name"""
+    started = time.time()
+    result = dict(name=name, status='ok', tables=0, error=None)
+    try:
+        engine = inspectors.create_engine(config, jobs)
+        try:
+            schema = inspectors.create_for(engine).dump(jobs)
+        finally:
+            engine.dispose()
+
+        basedir = os.path.join(outdir, name)
+        if not os.path.exists(basedir):
+            os.makedirs(basedir)
+
+        rst.write_docs(schema, basedir=basedir)
+        path = os.path.join(basedir, '%s.yaml' % schema['name'])
+        serializers.dump(schema, path)
+
+        result['tables'] = len(schema['tables'])
+    except Exception as exc:
+        result['status'] = 'failed'
+        result['error'] = '%s: %s' % (exc.__class__.__name__, exc)
+
+    result['duration'] = time.time() - started
+    return result
+
+
+def main(args=sys.argv[1:]):
+    options, args = parse_option(args)
+
+    configs = options.configs
+    names = [name for name, _ in configs]
+    duplicated = sorted(set(n for n in names if names.count(n) > 1))
+    if duplicated:
+        sys.stderr.write('duplicated database names: %s\n' %
+                         ', '.join(duplicated))
+        return 1
+
+    with futures.ProcessPoolExecutor(options.processes) as executor:
+        jobs = [executor.submit(document, name, config,
+                                options.output_dir, options.jobs)
+                for name, config in configs]
+        results = [job.result() for job in jobs]
+
+    print_summary(results)
+    if any(result['status'] != 'ok' for result in results):
+        return 1
+    else:
+        return 0
+
+
+def print_summary(results, stream=None):
+    stream = stream or sys.stdout
+    width = max([len(result['name']) for result in results] + [4])
+    for result in results:
+        stream.write('%-*s  %-6s  %5d tables  %8.2fs\n' %
+                     (width, result['name'], result['status'],
+                      result['tables'], result['duration']))
+        if result['error']:
+            stream.write('%*s  %s\n' % (width, '', result['error']))
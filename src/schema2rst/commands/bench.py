@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import optparse
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+import sqlalchemy
+from schema2rst import inspectors, serializers
+from schema2rst.commands import graph, rst
+from schema2rst.rstwriter import RestructuredTextWriter
+from schema2rst.stats import Stats
+
+BACKENDS = ('sqlite', 'mysql', 'postgresql')
+PHASES = ('reflect', 'serialize', 'rst', 'graph', 'startup')
+
+
+def parse_option(args):
+    usage = 'Usage: schemabench [options]'
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option('-t', '--tables', action='store', type='int',
+                      default=100, help='number of tables to generate')
+    parser.add_option('-m', '--columns', action='store', type='int',
+                      default=10, help='number of columns of each table')
+    parser.add_option('-k', '--foreign-keys', action='store', type='int',
+                      default=2, help='number of foreign keys of each table')
+    parser.add_option('-b', '--backend', action='append', choices=BACKENDS,
+                      help='database to benchmark: %s (default: sqlite; '
+                      'others run on testing.mysqld or testing.postgresql)' %
+                      ', '.join(BACKENDS))
+    parser.add_option('-j', '--jobs', action='store', type='int', default=1,
+                      help='number of tables to reflect concurrently')
+    parser.add_option('-f', '--format', action='store', default='yaml',
+                      choices=list(serializers.FORMATS),
+                      help='format to serialize the dump into')
+    parser.add_option('-o', '--output', action='store',
+                      help='file to write the JSON report into')
+
+    options, args = parser.parse_args(args)
+    if options.tables < 1 or options.columns < 1:
+        parser.error('--tables (-t) and --columns (-m) must be positive')
+
+    if options.foreign_keys < 0:
+        parser.error('--foreign-keys (-k) must not be negative')
+
+    if options.jobs < 1:
+        parser.error('--jobs (-j) must be a positive number')
+
+    options.backend = options.backend or ['sqlite']
+    return options, args
+
+
+def column_comment(n):
+    """Returns a CJK comment or a JSON comment, alternately"""
+    if n % 2:
+        return u'{"unit": "yen", "pii": false, "seq": %d}' % n
+    else:
+        return u'項目%d（説明%d）' % (n, n)
+
+
+def generate_ddl(dialect, tables, columns, foreign_keys):
+    """Returns DDL statements of a synthetic schema
+
+    Table *i* has an id, *columns* varchar columns, an index and up to
+    *foreign_keys* references to the preceding tables. Tables and
+    columns are commented on MySQL and PostgreSQL.
+    """
+    def quote(string):
+        return string.replace("'", "''")
+
+    statements = []
+    for i in range(tables):
+        name = 't%05d' % i
+        fields = ['id integer PRIMARY KEY']
+        comments = [(None, u'テーブル%d' % i)]
+        for j in range(columns):
+            fields.append('c%03d varchar(64)' % j)
+            comments.append(('c%03d' % j, column_comment(j)))
+
+        for j in range(min(foreign_keys, i)):
+            fields.append('fk%d integer REFERENCES t%05d(id)' %
+                          (j, i - j - 1))
+
+        if dialect == 'mysql':
+            for n, (column, comment) in enumerate(comments[1:], 1):
+                fields[n] += u" COMMENT '%s'" % quote(comment)
+            options = u" ENGINE=InnoDB COMMENT='%s'" % quote(comments[0][1])
+        else:
+            options = ''
+
+        statements.append(u'CREATE TABLE %s (%s)%s' %
+                          (name, ', '.join(fields), options))
+        statements.append('CREATE INDEX ix_%s ON %s (c000)' % (name, name))
+
+        if dialect == 'postgresql':
+            for column, comment in comments:
+                if column is None:
+                    target = 'TABLE %s' % name
+                else:
+                    target = 'COLUMN %s.%s' % (name, column)
+                statements.append(u"COMMENT ON %s IS '%s'" %
+                                  (target, quote(comment)))
+
+    return statements
+
+
+@contextmanager
+def database(backend, tmpdir):
+    """Yields the URL of an empty database of *backend*"""
+    if backend == 'sqlite':
+        yield 'sqlite:///%s' % os.path.join(tmpdir, 'bench.db')
+    elif backend == 'mysql':
+        import testing.mysqld
+        with testing.mysqld.Mysqld(my_cnf={'skip-networking': None}) as db:
+            yield db.url(charset='utf8')
+    else:
+        import testing.postgresql
+        with testing.postgresql.Postgresql() as db:
+            yield db.url()
+
+
+def measure(stats, func, *args):
+    """Calls *func* and returns (result, stats)
+
+    Stats hold the elapsed seconds, the peak memory allocated while the
+    call (traced by tracemalloc, which slows the call down a little) and
+    the number of queries.
+    """
+    queries = stats.queries['count']
+    tracemalloc.start()
+    try:
+        started = time.time()
+        result = func(*args)
+        elapsed = time.time() - started
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return result, dict(elapsed=elapsed, peak_memory=peak,
+                        queries=stats.queries['count'] - queries)
+
+
+#: renders a datafile like `schema2rst -d` and reports the loaded modules
+STARTUP_SCRIPT = """
+import sys, json, time
+started = time.time()
+from schema2rst.commands import rst
+rst.main(sys.argv[1:])
+json.dump(dict(elapsed=time.time() - started,
+               sqlalchemy='sqlalchemy' in sys.modules), sys.stdout)
+"""
+
+
+def measure_startup(datafile, output):
+    """Renders *datafile* in a new interpreter; returns the stats
+
+    Stats hold the elapsed seconds of the process, of the command itself
+    (imports included) and whether SQLAlchemy was imported.
+    """
+    package = os.path.dirname(os.path.dirname(inspectors.__file__))
+    env = dict(os.environ)
+    if env.get('PYTHONPATH'):
+        env['PYTHONPATH'] = os.pathsep.join([package, env['PYTHONPATH']])
+    else:
+        env['PYTHONPATH'] = package
+
+    started = time.time()
+    stdout = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT,
+                                      '-d', datafile, '-o', output], env=env)
+    elapsed = time.time() - started
+
+    result = json.loads(stdout.decode('utf-8'))
+    return dict(elapsed=elapsed, command=result['elapsed'],
+                sqlalchemy_imported=result['sqlalchemy'])
+
+
+def run(backend, options):
+    """Benchmarks *backend*; returns the result of each phase"""
+    tmpdir = tempfile.mkdtemp()
+    try:
+        with database(backend, tmpdir) as url:
+            engine = sqlalchemy.create_engine(url)
+            try:
+                for statement in generate_ddl(engine.dialect.name,
+                                              options.tables, options.columns,
+                                              options.foreign_keys):
+                    engine.execute(statement)
+
+                stats = Stats()
+                stats.watch(engine)
+                inspector = inspectors.create_for(engine)
+                schema, reflect = measure(stats, inspector.dump,
+                                          options.jobs)
+            finally:
+                engine.dispose()
+
+        # file names of docs are derived from the schema name
+        schema = dict(schema, name='bench')
+        phases = dict(reflect=reflect)
+
+        path = os.path.join(tmpdir, 'bench.dump')
+        _, phases['serialize'] = measure(stats, serializers.dump, schema,
+                                         path, options.format)
+        phases['serialize']['size'] = os.path.getsize(path)
+
+        _, phases['rst'] = measure(stats, rst.write_docs, schema, None,
+                                   tmpdir, True)
+
+        def render_graph():
+            path = os.path.join(tmpdir, 'graph.rst')
+            with RestructuredTextWriter(path) as doc:
+                graph.generate_doc(doc, schema)
+
+        _, phases['graph'] = measure(stats, render_graph)
+
+        output = os.path.join(tmpdir, 'startup.rst')
+        phases['startup'] = measure_startup(path, output)
+
+        return dict(backend=backend, tables=len(schema['tables']),
+                    phases=phases)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main(args=sys.argv[1:]):
+    options, args = parse_option(args)
+
+    report = dict(
+        parameters=dict(tables=options.tables, columns=options.columns,
+                        foreign_keys=options.foreign_keys,
+                        jobs=options.jobs, format=options.format),
+        environment=dict(python=platform.python_version(),
+                         sqlalchemy=sqlalchemy.__version__),
+        results=[run(backend, options) for backend in options.backend],
+    )
+
+    content = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with io.open(options.output, 'w', encoding='utf-8') as f:
+            f.write(content + '\n')
+    else:
+        print(content)
+
+    for result in report['results']:
+        sys.stderr.write('%-10s %6d tables' %
+                         (result['backend'], result['tables']))
+        for phase in PHASES[:-1]:
+            stats = result['phases'][phase]
+            sys.stderr.write('  %s %.2fs/%.1fMB' %
+                             (phase, stats['elapsed'],
+                              stats['peak_memory'] / 1024.0 / 1024.0))
+
+        stats = result['phases']['startup']
+        sys.stderr.write('  startup %.2fs%s' %
+                         (stats['elapsed'],
+                          ' (sqlalchemy)' if stats['sqlalchemy_imported']
+                          else ''))
+        sys.stderr.write('\n')
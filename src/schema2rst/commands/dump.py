@@ -14,11 +14,12 @@
 #  limitations under the License.
 
 import io
-import six
+import os
 import sys
 import yaml
 import optparse
-from schema2rst import inspectors
+from schema2rst import inspectors, serializers
+from schema2rst.stats import Stats, add_options
 
 
 def parse_option(args):
@@ -26,39 +27,103 @@ def parse_option(args):
     parser = optparse.OptionParser(usage=usage)
     parser.add_option('-c', '--config', action='store')
     parser.add_option('-o', '--output', action='store')
+    parser.add_option('-j', '--jobs', action='store', type='int', default=1,
+                      help='number of tables to reflect concurrently')
+    parser.add_option('--previous', action='store',
+                      help='previous dump to copy unchanged tables from')
+    parser.add_option('-f', '--format', action='store', type='choice',
+                      choices=list(serializers.FORMATS),
+                      help=('output format: %s (default: guessed from '
+                            'the extension of output, or yaml)' %
+                            ', '.join(serializers.FORMATS)))
+    inspectors.add_filter_options(parser)
+    add_options(parser)
 
     options, args = parser.parse_args(args)
+    if options.jobs < 1:
+        parser.error('--jobs (-j) must be a positive number')
 
     if options.config is None:
         parser.error('--config (-c) is required')
 
+    if inspectors.is_multi_schema(options):
+        if options.output is None:
+            parser.error('--output (-o) directory is required for '
+                         'multiple schemas')
+
+        if options.previous:
+            parser.error('--previous is only available with a single schema')
+
+    if options.format is None:
+        options.format = serializers.guess_format(options.output) or 'yaml'
+
     return options, args
 
 
 def main(args=sys.argv[1:]):
     options, args = parse_option(args)
 
-    config = yaml.load(io.open(options.config, encoding='utf-8'))
+    stats = Stats()
+    config = yaml.safe_load(io.open(options.config, encoding='utf-8'))
+    engine = inspectors.create_engine(config, options.jobs)
+    stats.watch(engine)
     try:
-        engine = inspectors.create_engine(config)
-        schema = inspectors.create_for(engine).dump()
-    finally:
-        engine.dispose()
+        with stats.phase('load'):
+            previous = load_previous(options.previous)
 
-    try:
-        if options.output:
-            output = io.open(options.output, 'w', encoding='utf-8')
+        tables = inspectors.create_filter(options)
+        if inspectors.is_multi_schema(options):
+            with stats.phase('reflect+serialize'):
+                dump_schemas(engine, options, tables, stats)
         else:
-            output = io.open(sys.stdout.fileno(), 'w', encoding='utf-8')
+            schema_name = options.schemas[0] if options.schemas else None
+            inspector = inspectors.create_for(engine, schema_name, tables,
+                                              options.collapse)
+            if serializers.get_serializer(options.format).streaming:
+                # tables are written while they are reflected
+                with stats.phase('reflect+serialize'):
+                    schema = inspector.iterdump(options.jobs, previous)
+                    serializers.dump(schema, options.output, options.format)
+            else:
+                with stats.phase('reflect'):
+                    schema = inspector.dump(options.jobs, previous)
+                with stats.phase('serialize'):
+                    serializers.dump(schema, options.output, options.format)
 
-        output.write(serialize(schema))
+            stats.add_inspector(inspector)
     finally:
-        output.close()
+        engine.dispose()
+
+    stats.report(options)
+
+
+def dump_schemas(engine, options, tables, stats):
+    """Writes a dump of each schema into <output>/<schema>.<format>"""
+    if not os.path.isdir(options.output):
+        os.makedirs(options.output)
+
+    extension = options.format.split('-')[0]
+    dumped = []
+
+    def dump(inspector, jobs):
+        schema = inspector.dump(jobs)
+        path = os.path.join(options.output,
+                            '%s.%s' % (schema['name'], extension))
+        serializers.dump(schema, path, options.format)
+        dumped.append(inspector)
 
+    schemas = inspectors.resolve_schemas(engine, options.schemas)
+    inspectors.dump_schemas(engine, schemas, tables, options.jobs, dump,
+                            options.collapse)
+    for inspector in dumped:
+        stats.add_inspector(inspector)
 
-def serialize(data):
-    ret = yaml.safe_dump(data)
-    if isinstance(ret, six.binary_type):
-        ret = ret.decode('utf-8')
 
-    return ret
+def load_previous(path):
+    """Returns the dump stored in *path*, or None if it does not exist"""
+    if path and os.path.exists(path):
+        schema = serializers.load(path)
+        schema['tables'] = list(schema['tables'])
+        return schema
+    else:
+        return None
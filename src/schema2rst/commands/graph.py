@@ -17,8 +17,15 @@ import io
 import sys
 import yaml
 import optparse
-from schema2rst import inspectors
+import collections
+from schema2rst import inspectors, serializers
+from schema2rst.cache import DumpCache, DEFAULT_DIRECTORY
+from schema2rst.commands.rst import reiterable
 from schema2rst.rstwriter import RestructuredTextWriter
+from schema2rst.stats import Stats, add_options
+
+
+SPLIT_MODES = ('components', 'clusters')
 
 
 def parse_option(args):
@@ -27,52 +34,323 @@ def parse_option(args):
     parser.add_option('-c', '--config', action='store')
     parser.add_option('-d', '--datafile', action='store')
     parser.add_option('-o', '--output', action='store')
+    parser.add_option('-j', '--jobs', action='store', type='int', default=1,
+                      help='number of tables to reflect concurrently')
+    parser.add_option('--cache-ttl', action='store', type='int', default=0,
+                      help='cache reflected schema for the given seconds')
+    parser.add_option('--cache-dir', action='store',
+                      help='directory of the cache (default: %s)' %
+                      DEFAULT_DIRECTORY)
+    parser.add_option('--refresh', action='store_true', default=False,
+                      help='reflect the database even if it is cached')
+    parser.add_option('-s', '--split', action='store', type='choice',
+                      choices=SPLIT_MODES,
+                      help=('split the graph by connected components: '
+                            '"components" writes a graph per component, '
+                            '"clusters" a subgraph per component'))
+    parser.add_option('--focus', action='store', metavar='TABLE',
+                      help='graph only tables around TABLE')
+    parser.add_option('--depth', action='store', type='int',
+                      help='number of foreign keys to follow from the '
+                      '--focus table (default: 1)')
+    inspectors.add_filter_options(parser)
+    add_options(parser)
 
     options, args = parser.parse_args(args)
+    if options.jobs < 1:
+        parser.error('--jobs (-j) must be a positive number')
+
+    if options.depth is not None and options.focus is None:
+        parser.error('--depth is only available with --focus')
+
+    if options.depth is None:
+        options.depth = 1
+    elif options.depth < 0:
+        parser.error('--depth must not be negative')
+
+    if options.focus and options.split:
+        parser.error('Specify either --focus or --split (-s)')
+
     if options.config is None and options.datafile is None:
         parser.error('--config (-c) or --datafile (-d) is required')
 
     if options.config and options.datafile:
         parser.error('Specify either --config (-c) or --datafile (-d)')
 
+    if options.datafile and (options.schemas or options.include or
+                             options.exclude or options.collapse):
+        parser.error('--schema, --include, --exclude and --collapse are '
+                     'only available with --config (-c)')
+
     return options, args
 
 
 def main(args=sys.argv[1:]):
     options, args = parse_option(args)
 
+    stats = Stats()
     if options.datafile:
-        schema = yaml.safe_load(open(options.datafile))
+        # tables of a streamed dump are loaded while they are rendered
+        schemas = [serializers.load(options.datafile)]
     else:
         try:
-            config = yaml.load(io.open(options.config, encoding='utf-8'))
-            engine = inspectors.create_engine(config)
-            schema = inspectors.create_for(engine).dump()
+            config = yaml.safe_load(io.open(options.config, encoding='utf-8'))
+            engine = inspectors.create_engine(config, options.jobs)
+            stats.watch(engine)
+            if options.cache_ttl > 0:
+                cache = DumpCache(options.cache_ttl, options.cache_dir)
+            else:
+                cache = None
+
+            dumped = []
+
+            def reflect(inspector, jobs):
+                if cache:
+                    schema = cache.dump(inspector, jobs,
+                                        refresh=options.refresh)
+                else:
+                    schema = inspector.dump(jobs)
+
+                dumped.append(inspector)
+                return schema
+
+            with stats.phase('reflect'):
+                names = inspectors.resolve_schemas(engine, options.schemas)
+                schemas = inspectors.dump_schemas(
+                    engine, names, inspectors.create_filter(options),
+                    options.jobs, reflect, options.collapse)
+
+            for inspector in dumped:
+                stats.add_inspector(inspector)
         finally:
             engine.dispose()
 
-    doc = RestructuredTextWriter(options.output)
-    generate_doc(doc, schema)
+    with stats.phase('render'):
+        if options.focus:
+            indexes = [(schema['name'], GraphIndex(schema['tables']))
+                       for schema in schemas]
+            indexes = [(name, index) for name, index in indexes
+                       if options.focus in index.labels]
+            if not indexes:
+                sys.stderr.write('table not found: %s\n' % options.focus)
+                return 1
+
+            with RestructuredTextWriter(options.output) as doc:
+                for name, index in indexes:
+                    names = index.neighbourhood(options.focus, options.depth)
+                    doc.title('Schema: %s' % name)
+                    write_graph(doc, index, names)
+        elif options.split:
+            with RestructuredTextWriter(options.output) as doc:
+                for schema in schemas:
+                    generate_split_doc(doc, schema, options.split)
+        else:
+            with RestructuredTextWriter(options.output) as doc:
+                for schema in schemas:
+                    generate_doc(doc, schema)
+
+    stats.report(options)
 
 
 def generate_doc(doc, schema):
-    doc.header('Schema: %s' % schema['name'])
+    """Writes the ER graph of the schema
+
+    schema['tables'] may be a stream of tables; it is walked once to
+    find the members of collapsed tables and once to write the graph,
+    handling only the node and edges of the current table at a time.
+    """
+    tables = reiterable(schema['tables'])
+    families = find_families(tables)
+
+    doc.title('Schema: %s' % schema['name'])
 
     doc.println(".. graphviz::")
     doc.println("")
     doc.println("   digraph {")
     doc.println("      node [shape = box];")
 
-    for table in schema['tables']:
-        if table['fullname']:
-            doc.println('      %s [label="%s\\n(%s)"];' %
-                        (table['name'], table['name'], table['fullname']))
-        else:
-            doc.println('      %s;' % table['name'])
+    for table in tables:
+        write_node(doc, table['name'], table_comment(table))
+        for referred_table in referred_tables(table, families):
+            doc.println('      %s -> %s;' % (table['name'], referred_table))
+
+    doc.println("   }")
+
+
+def generate_split_doc(doc, schema, mode):
+    """Writes the ER graph of the schema split by connected components
+
+    With mode 'components', each component gets its own graph (tables
+    without foreign keys are gathered into the last one); with
+    'clusters', components are cluster subgraphs of one graph.
+    """
+    doc.title('Schema: %s' % schema['name'])
+
+    index = GraphIndex(schema['tables'])
+    components = index.components()
+    if mode == 'clusters':
+        write_graph(doc, index, components=components)
+    else:
+        isolated = [c[0] for c in components if len(c) == 1]
+        components = [c for c in components if len(c) > 1]
+        for number, names in enumerate(components, 1):
+            doc.title('Component %d' % number, '-')
+            write_graph(doc, index, names)
+
+        if isolated:
+            doc.title('Unrelated tables', '-')
+            write_graph(doc, index, isolated)
+
+
+def table_comment(table):
+    # dumps of older versions call the table comment 'fullname'
+    return table.get('comment', table.get('fullname'))
+
+
+def find_families(tables):
+    """Returns {member: collapsed table} of members of collapsed tables
+
+    Members which are documented as tables themselves are left out.
+    """
+    names = set()
+    families = {}
+    for table in tables:
+        names.add(table['name'])
+        for member in table.get('members') or []:
+            families.setdefault(member, table['name'])
+
+    return dict((member, name) for member, name in families.items()
+                if member not in names)
 
-        for key in table['foreign_keys']:
-            doc.println('      %s -> %s;' %
-                        (table['name'], key['referred_table']))
+
+def referred_tables(table, families={}):
+    """Returns tables referred by the table, without duplicates
+
+    Members of collapsed tables are replaced by the collapsed table
+    (see find_families()).
+    """
+    return list(collections.OrderedDict.fromkeys(
+        families.get(key['referred_table'], key['referred_table'])
+        for key in table['foreign_keys']))
+
+
+def write_node(doc, name, comment, indent=6):
+    if comment:
+        doc.println('%s%s [label="%s\\n(%s)"];' %
+                    (' ' * indent, name, name, comment))
+    else:
+        doc.println('%s%s;' % (' ' * indent, name))
+
+
+def write_graph(doc, index, names=None, components=None):
+    """Writes a graph of *names* (or cluster subgraphs of *components*)
+
+    Only the edges between the written tables are drawn.
+    """
+    doc.println(".. graphviz::")
+    doc.println("")
+    doc.println("   digraph {")
+    doc.println("      node [shape = box];")
+
+    if components is None:
+        components = [names]
+        indent = 6
+    else:
+        indent = 9
+
+    for number, component in enumerate(components, 1):
+        if indent > 6:
+            doc.println("      subgraph cluster_%d {" % number)
+
+        for name in component:
+            write_node(doc, name, index.labels.get(name), indent)
+
+        if indent > 6:
+            doc.println("      }")
+
+    written = set(name for component in components for name in component)
+    for component in components:
+        for name in component:
+            for referred_table in index.edges.get(name, []):
+                if referred_table in written:
+                    doc.println('      %s -> %s;' % (name, referred_table))
 
     doc.println("   }")
-    doc.close()
+
+
+class GraphIndex(object):
+    """Foreign key adjacency index of tables
+
+    *labels* maps table names to their comments (in the order of the
+    tables), *edges* maps them to the referred tables and *neighbours*
+    to the tables linked in either direction. Only names are kept, so the
+    tables may be streamed. Foreign keys to members of collapsed tables
+    link to the collapsed table.
+    """
+    def __init__(self, tables=()):
+        self.labels = collections.OrderedDict()
+        self.edges = collections.OrderedDict()
+        self.neighbours = collections.defaultdict(set)
+
+        # only names are kept until the collapsed tables are known
+        outlines = []
+        for table in tables:
+            self.labels[table['name']] = table_comment(table)
+            outlines.append(dict(
+                name=table['name'],
+                foreign_keys=[dict(referred_table=key['referred_table'])
+                              for key in table['foreign_keys']],
+                members=table.get('members')))
+
+        families = find_families(outlines)
+        for table in outlines:
+            name = table['name']
+            self.edges[name] = referred_tables(table, families)
+            for referred_table in self.edges[name]:
+                self.neighbours[name].add(referred_table)
+                self.neighbours[referred_table].add(name)
+
+    def components(self):
+        """Returns lists of names of connected tables
+
+        Components and their tables are ordered by the first appearance
+        of the tables. Referred tables not in the schema are left out.
+        """
+        order = dict((name, i) for i, name in enumerate(self.labels))
+        seen = set()
+        components = []
+        for name in self.labels:
+            if name in seen:
+                continue
+
+            seen.add(name)
+            component = set([name])
+            queue = collections.deque([name])
+            while queue:
+                for neighbour in self.neighbours[queue.popleft()]:
+                    if neighbour not in seen and neighbour in self.labels:
+                        seen.add(neighbour)
+                        component.add(neighbour)
+                        queue.append(neighbour)
+
+            components.append(sorted(component, key=order.get))
+
+        return components
+
+    def neighbourhood(self, name, depth=1):
+        """Returns names of tables within *depth* foreign keys of *name*"""
+        distances = {name: 0}
+        queue = collections.deque([name])
+        while queue:
+            current = queue.popleft()
+            if distances[current] == depth:
+                continue
+
+            for neighbour in self.neighbours[current]:
+                if neighbour not in distances:
+                    distances[neighbour] = distances[current] + 1
+                    queue.append(neighbour)
+
+        order = dict((n, i) for i, n in enumerate(self.labels))
+        return sorted(distances,
+                      key=lambda n: (n not in order, order.get(n, 0), n))
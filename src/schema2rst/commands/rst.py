@@ -16,10 +16,20 @@
 import io
 import sys
 import os
+import json
 import yaml
+import hashlib
+import collections
 import optparse
-from schema2rst import inspectors
+from concurrent.futures import ProcessPoolExecutor
+from schema2rst import inspectors, models, serializers
+from schema2rst.cache import DumpCache, DEFAULT_DIRECTORY
+from schema2rst.commands import dump
 from schema2rst.rstwriter import RestructuredTextWriter
+from schema2rst.stats import Stats, add_options
+
+#: bumped whenever generate_doc() output changes, to rewrite all files
+MANIFEST_VERSION = 2
 
 
 def parse_option(args):
@@ -28,50 +38,338 @@ def parse_option(args):
     parser.add_option('-c', '--config', action='store')
     parser.add_option('-d', '--datafile', action='store')
     parser.add_option('-o', '--output', action='store')
+    parser.add_option('-j', '--jobs', action='store', type='int', default=1,
+                      help='number of tables to reflect concurrently')
+    parser.add_option('--cache-ttl', action='store', type='int', default=0,
+                      help='cache reflected schema for the given seconds')
+    parser.add_option('--cache-dir', action='store',
+                      help='directory of the cache (default: %s)' %
+                      DEFAULT_DIRECTORY)
+    parser.add_option('--refresh', action='store_true', default=False,
+                      help='reflect the database even if it is cached')
+    parser.add_option('--previous', action='store',
+                      help='previous dump to copy unchanged tables from')
+    parser.add_option('-f', '--force', action='store_true', default=False,
+                      help='rewrite all files even if tables are unchanged')
+    parser.add_option('--render-jobs', action='store', type='int', default=1,
+                      help='number of processes to write table files')
+    inspectors.add_filter_options(parser)
+    add_options(parser)
 
     options, args = parser.parse_args(args)
+    if options.jobs < 1:
+        parser.error('--jobs (-j) must be a positive number')
+
+    if options.render_jobs < 1:
+        parser.error('--render-jobs must be a positive number')
+
     if options.config is None and options.datafile is None:
         parser.error('--config (-c) or --datafile (-d) is required')
 
     if options.config and options.datafile:
         parser.error('Specify either --config (-c) or --datafile (-d)')
 
+    if options.previous and options.datafile:
+        parser.error('--previous is only available with --config (-c)')
+
+    if options.datafile and (options.schemas or options.include or
+                             options.exclude or options.collapse):
+        parser.error('--schema, --include, --exclude and --collapse are '
+                     'only available with --config (-c)')
+
+    if options.previous and inspectors.is_multi_schema(options):
+        parser.error('--previous is only available with a single schema')
+
     return options, args
 
 
 def main(args=sys.argv[1:]):
     options, args = parse_option(args)
 
+    stats = Stats()
     if options.datafile:
-        schema = yaml.safe_load(open(options.datafile))
+        # tables of a streamed dump are loaded while they are rendered
+        schemas = [serializers.load(options.datafile)]
     else:
         try:
             config = yaml.safe_load(io.open(options.config, encoding='utf-8'))
-            engine = inspectors.create_engine(config)
-            schema = inspectors.create_for(engine).dump()
+            engine = inspectors.create_engine(config, options.jobs)
+            stats.watch(engine)
+            with stats.phase('load'):
+                previous = dump.load_previous(options.previous)
+
+            if options.cache_ttl > 0:
+                cache = DumpCache(options.cache_ttl, options.cache_dir)
+            else:
+                cache = None
+
+            dumped = []
+
+            def reflect(inspector, jobs):
+                if cache:
+                    schema = cache.dump(inspector, jobs, previous,
+                                        refresh=options.refresh)
+                else:
+                    schema = inspector.dump(jobs, previous)
+
+                dumped.append(inspector)
+                return schema
+
+            with stats.phase('reflect'):
+                names = inspectors.resolve_schemas(engine, options.schemas)
+                schemas = inspectors.dump_schemas(
+                    engine, names, inspectors.create_filter(options),
+                    options.jobs, reflect, options.collapse)
+
+            for inspector in dumped:
+                stats.add_inspector(inspector)
         finally:
             engine.dispose()
 
+    with stats.phase('render'):
+        if options.output and len(schemas) > 1:
+            with RestructuredTextWriter(options.output) as doc:
+                for schema in schemas:
+                    generate_schema_doc(doc, schema)
+        else:
+            for schema in schemas:
+                write_docs(schema, options.output, force=options.force,
+                           render_jobs=options.render_jobs)
+
+    stats.report(options)
+
+
+def fingerprint(data):
+    """Returns a stable hash of dumped data"""
+    string = json.dumps(data, sort_keys=True, default=models.serializable,
+                        ensure_ascii=False)
+    return hashlib.sha1(string.encode('utf-8')).hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with io.open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (IOError, ValueError):
+        return dict(version=MANIFEST_VERSION, index=None, tables={})
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return dict(version=MANIFEST_VERSION, index=None, tables={})
+
+    return manifest
+
+
+def save_manifest(path, manifest):
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def write_docs(schema, output=None, basedir='.', force=False,
+               render_jobs=1):
+    """Writes docs of the schema
+
+    Everything goes to *output* if given; otherwise <schema>.rst and one
+    <schema>/<table>.rst per table are written under *basedir*.
+
+    In the latter case, fingerprints of the tables are kept in
+    <schema>.manifest.json; only files of changed tables are rewritten
+    (unless *force* is given) and files of dropped tables are removed.
+    Table files are written by *render_jobs* worker processes, while the
+    index and the manifest are written by the caller.
+    """
     schema_name = schema['name']
+    if output:
+        with RestructuredTextWriter(output) as doc:
+            generate_schema_doc(doc, schema)
+    else:
+        tables = reiterable(schema['tables'])
+        references, table_links = link_tables(schema_name,
+                                              outline_tables(tables),
+                                              split=True)
+
+        manifest_path = os.path.join(basedir, f"{schema_name}.manifest.json")
+        if force:
+            manifest = dict(version=MANIFEST_VERSION, index=None, tables={})
+        else:
+            manifest = load_manifest(manifest_path)
+
+        tabledir = os.path.join(basedir, schema_name)
+        if not os.path.exists(tabledir):
+            os.mkdir(tabledir)
+
+        if render_jobs > 1:
+            executor = ProcessPoolExecutor(render_jobs)
+        else:
+            executor = None
+
+        fingerprints = collections.OrderedDict()
+        pending = collections.deque()
+        try:
+            for table in tables:
+                name = table['name']
+                args = (schema_name, table, references.get(name, []),
+                        table_links(table))
+                fingerprints[name] = fingerprint(args[1:])
+
+                path = os.path.join(tabledir, f"{name}.rst")
+                if (manifest['tables'].get(name) == fingerprints[name] and
+                        os.path.exists(path)):
+                    continue
+
+                if executor is None:
+                    write_table_doc(path, *args)
+                else:
+                    # keep a bounded number of tables in flight
+                    if len(pending) >= render_jobs * 2:
+                        pending.popleft().result()
+                    pending.append(executor.submit(write_table_doc, path,
+                                                   *args))
+
+            while pending:
+                pending.popleft().result()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        index = fingerprint([schema_name, list(fingerprints)])
+        path = os.path.join(basedir, f"{schema_name}.rst")
+        if manifest['index'] != index or not os.path.exists(path):
+            with RestructuredTextWriter(path) as doc:
+                doc.title(schema['name'])
+                documents = [f"{schema_name}/{name}" for name in fingerprints]
+                doc.toctree(documents, [":maxdepth: 1"])
+
+        for table_name in manifest['tables']:
+            path = os.path.join(tabledir, f"{table_name}.rst")
+            if table_name not in fingerprints and os.path.exists(path):
+                os.remove(path)
+
+        save_manifest(manifest_path, dict(version=MANIFEST_VERSION,
+                                          index=index, tables=fingerprints))
+
+
+def generate_schema_doc(doc, schema):
+    """Writes docs of all tables of the schema into *doc*"""
+    tables = reiterable(schema['tables'])
+    references, table_links = link_tables(schema['name'],
+                                          outline_tables(tables))
+
+    doc.title(schema['name'])
+    for table in tables:
+        generate_doc(doc, schema['name'], table,
+                     references.get(table['name'], []), table_links(table))
+
+
+def reiterable(tables):
+    """Returns *tables* as an iterable which can be walked twice
 
-    if options.output:
-        doc = RestructuredTextWriter(options.output)
-        doc.title(schema['name'])
-        for table in schema['tables']:
-            generate_doc(doc, schema_name, table)
+    Links and "Referenced by" need all tables before the first one is
+    rendered, so tables are walked once to link them and once to render
+    them. Lists and streamed dumps (serializers.StreamedTables) are
+    returned as is; only one-shot iterators are loaded into a list.
+    """
+    if iter(tables) is tables:
+        return list(tables)
     else:
+        return tables
+
+
+def outline_tables(tables):
+    """Returns names, foreign keys and members of the tables
+
+    Only what link_tables() needs is kept, so the columns of a streamed
+    dump are not held in memory.
+    """
+    outlines = []
+    for table in tables:
+        foreign_keys = [dict(referred_table=key['referred_table'],
+                             constrained_columns=list(
+                                 key.get('constrained_columns') or []))
+                        for key in table['foreign_keys']]
+        outlines.append(dict(name=table['name'], foreign_keys=foreign_keys,
+                             members=table.get('members')))
+
+    return outlines
+
+
+def link_tables(schema_name, tables, split=False):
+    """Returns (references, function returning the anchors of a table)
+
+    references is the result of build_references(); the function gives
+    the anchors of the tables linked from a table, by foreign keys from
+    or to it. Members of collapsed tables link to the collapsed table.
+    """
+    anchors = build_anchors(schema_name, [t['name'] for t in tables], split)
+    references = build_references(tables)
+    for table in tables:
+        for member in table.get('members') or []:
+            anchors.setdefault(member, anchors[table['name']])
+            if member in references and member != table['name']:
+                references.setdefault(table['name'], []).extend(
+                    references.pop(member))
+
+    def table_links(table):
+        names = [key['referred_table'] for key in table['foreign_keys']]
+        names += [name for name, _ in references.get(table['name'], [])]
+        return dict((name, anchors[name]) for name in names
+                    if name in anchors)
+
+    return references, table_links
 
-        doc = RestructuredTextWriter(f"{schema_name}.rst")
-        doc.title(schema['name'])
-        doc.toctree([f"{schema_name}/{t['name']}" for t in schema['tables']], [":maxdepth: 1"])
 
-        if not os.path.exists(schema_name):
-            os.mkdir(schema_name)
-        for table in schema['tables']:
-            doc = RestructuredTextWriter(f"{schema_name}/{table['name']}.rst")
-            generate_doc(doc, schema['name'], table)
+def build_anchors(schema, table_names, split=False):
+    """Returns {table name: (document, label)} of the tables
 
-def generate_doc(doc, schema, table):
+    The document is the path of the table file in split-file mode, or
+    None if all tables are in the same document; the label is the target
+    written by RestructuredTextWriter.header().
+    """
+    anchors = {}
+    for name in table_names:
+        document = f"{schema}/{name}" if split else None
+        anchors[name] = (document, f"{schema}.{name}")
+
+    return anchors
+
+
+def build_references(tables):
+    """Returns {table name: [(referring table, constrained columns)]}"""
+    references = {}
+    for table in tables:
+        for key in table['foreign_keys']:
+            columns = key.get('constrained_columns') or []
+            references.setdefault(key['referred_table'], []).append(
+                (table['name'], list(columns)))
+
+    return references
+
+
+def make_link(anchors, table_name, text):
+    """Returns a reference to the table, or *text* if it is not documented"""
+    if table_name not in anchors:
+        return text
+
+    document, label = anchors[table_name]
+    if document is None:
+        return f"`{text} <{label}_>`__"
+    else:
+        return f":ref:`{text} <{label}>`"
+
+
+def write_table_doc(path, schema, table, references=(), anchors=None):
+    """Writes the doc of a table to *path* (run in worker processes)"""
+    with RestructuredTextWriter(path) as doc:
+        generate_doc(doc, schema, table, references, anchors)
+
+
+def generate_doc(doc, schema, table, references=(), anchors=None):
+    """Writes the doc of a table
+
+    *references* lists (table name, columns) of the foreign keys referring
+    to the table and *anchors* maps names of the linked tables to their
+    (document, label); see build_references() and build_anchors().
+    """
+    anchors = anchors or {}
 
     doc.header(schema, table['name'], table['comment'], '-')
 
@@ -79,15 +377,21 @@ def generate_doc(doc, schema, table):
 
     doc.listtable(headers)
 
+    # link referred columns of each constrained column
+    links = {}
+    for key in table['foreign_keys']:
+        referred_columns = key.get('referred_columns') or []
+        for column, referred_column in zip(key.get('constrained_columns')
+                                           or [], referred_columns):
+            text = f"{key['referred_table']}.{referred_column}"
+            links.setdefault(column, []).append(
+                make_link(anchors, key['referred_table'], text))
+
     for c in table['columns']:
-        fk = c.get('fkey', '')
-        if 'FK:' in fk:
-            # make hyperlink on referenced table
-            fks = []
-            for d in fk.replace('FK: ','').split(', '):
-                t,_ = d.split('.')
-                fks.append(f"`{d} <#{t.replace('_','-')}>`_")
-            fk = ', '.join(fks)
+        if c['name'] in links:
+            fk = ', '.join(links[c['name']])
+        else:
+            fk = c.get('fkey', '')
 
         columns = []
         for h in headers:
@@ -114,3 +418,20 @@ def generate_doc(doc, schema, table):
                                ', '.join(index['column_names']))
             doc.list_item(string)
 
+    if references:
+        doc.title('Referenced by', '^')
+        for table_name, columns in references:
+            link = make_link(anchors, table_name, f"{schema}.{table_name}")
+            if columns:
+                doc.list_item(f"{link} ({', '.join(columns)})")
+            else:
+                doc.list_item(link)
+
+    members = table.get('members')
+    if members:
+        doc.title('Members', '^')
+        doc.println(f"{len(members)} tables of the same structure:")
+        doc.println("")
+        for member in members:
+            doc.list_item(member)
+
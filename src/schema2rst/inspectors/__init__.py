@@ -13,10 +13,28 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import sqlalchemy
+import fnmatch
+import importlib
+from concurrent import futures
 
+#: database types handled by asyncio drivers instead of SQLAlchemy
+ASYNC_TYPES = ('postgresql+asyncpg', 'mysql+aiomysql')
 
-def create_engine(config):
+#: entry point group of inspector classes, named by the database driver
+ENTRY_POINT_GROUP = 'schema2rst.inspectors'
+
+#: built-in inspectors (used when the package is not installed)
+INSPECTORS = {
+    'mysqldb': 'schema2rst.inspectors.mysql:MySQLInspector',
+    'pymysql': 'schema2rst.inspectors.mysql:MySQLInspector',
+    'psycopg2': 'schema2rst.inspectors.pgsql:PgSQLInspector',
+    'asyncpg': 'schema2rst.inspectors.aio:AsyncPgSQLInspector',
+    'aiomysql': 'schema2rst.inspectors.aio:AsyncMySQLInspector',
+}
+DEFAULT_INSPECTOR = 'schema2rst.inspectors.base:SimpleInspector'
+
+
+def create_engine(config, pool_size=None):
     schema = config.get('type', 'mysql')
     if 'unix_socket' in config:
         url = ('%s://%s:%s@localhost/%s?unix_socket=%s' %
@@ -33,16 +51,128 @@ def create_engine(config):
         if schema.startswith('mysql'):
             url += "?charset=utf8"
 
-    return sqlalchemy.create_engine(url)
+    if schema in ASYNC_TYPES:
+        from schema2rst.inspectors.aio import AsyncEngine
+        return AsyncEngine(url, pool_size)
+
+    # SQLAlchemy is imported only when a database is used
+    import sqlalchemy
+    if pool_size and pool_size > 1:
+        return sqlalchemy.create_engine(url, pool_size=pool_size)
+    else:
+        return sqlalchemy.create_engine(url)
+
 
+def iter_entry_points(group):
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # python < 3.8
+        return []
 
-def create_for(engine):
-    if engine.driver in ('mysqldb', 'pymysql'):
-        from schema2rst.inspectors.mysql import MySQLInspector
-        return MySQLInspector(engine)
-    elif engine.driver in ('psycopg2',):
-        from schema2rst.inspectors.pgsql import PgSQLInspector
-        return PgSQLInspector(engine)
+    points = entry_points()
+    if hasattr(points, 'select'):
+        return points.select(group=group)
     else:
-        from schema2rst.inspectors.base import SimpleInspector
-        return SimpleInspector(engine)
+        return points.get(group, [])
+
+
+def find_inspector(driver):
+    """Returns the inspector class for the database *driver*
+
+    Inspectors registered as entry points of ENTRY_POINT_GROUP take
+    precedence over the built-in ones; nothing is imported until the
+    inspector is looked up.
+    """
+    for entry_point in iter_entry_points(ENTRY_POINT_GROUP):
+        if entry_point.name == driver:
+            return entry_point.load()
+
+    module, name = INSPECTORS.get(driver, DEFAULT_INSPECTOR).split(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def create_for(engine, schema=None, tables=None, collapse=False):
+    return find_inspector(engine.driver)(engine, schema, tables, collapse)
+
+
+def is_glob(pattern):
+    return any(c in pattern for c in '*?[')
+
+
+def resolve_schemas(engine, patterns):
+    """Returns names of schemas given by --schema options
+
+    Glob *patterns* are expanded against the database; plain names are
+    kept as is.  Without patterns, [None] (the default schema) is returned.
+    """
+    if not patterns:
+        return [None]
+
+    schemas = []
+    globs = [pattern for pattern in patterns if is_glob(pattern)]
+    if globs:
+        matched = create_for(engine).find_schemas(globs)
+    for pattern in patterns:
+        if is_glob(pattern):
+            names = [name for name in matched
+                     if fnmatch.fnmatchcase(name, pattern)]
+        else:
+            names = [pattern]
+        schemas.extend(name for name in names if name not in schemas)
+
+    return schemas
+
+
+def dump_schemas(engine, schemas, tables=None, jobs=1, dump=None,
+                 collapse=False):
+    """Dumps each of *schemas*; returns the dumps in the same order
+
+    Schemas are reflected concurrently by their own inspectors, sharing
+    the *jobs* threads.  *dump* is called as dump(inspector, jobs) to
+    produce a dump instead of inspector.dump(jobs); e.g. to go through
+    DumpCache.
+    """
+    if dump is None:
+        def dump(inspector, jobs):
+            return inspector.dump(jobs)
+
+    table_jobs = max(1, jobs // len(schemas))
+
+    def run(schema):
+        return dump(create_for(engine, schema, tables, collapse), table_jobs)
+
+    if jobs <= 1 or len(schemas) <= 1:
+        return [run(schema) for schema in schemas]
+
+    with futures.ThreadPoolExecutor(min(jobs, len(schemas))) as executor:
+        return list(executor.map(run, schemas))
+
+
+def add_filter_options(parser):
+    """Adds options to select schemas and tables to the command *parser*"""
+    parser.add_option('--schema', action='append', dest='schemas',
+                      metavar='SCHEMA', default=[],
+                      help='schema to document instead of the default one; '
+                      'glob patterns are allowed (repeatable)')
+    parser.add_option('--include', action='append', metavar='PATTERN',
+                      default=[],
+                      help='document only tables matching the glob '
+                      'pattern (repeatable)')
+    parser.add_option('--exclude', action='append', metavar='PATTERN',
+                      default=[],
+                      help='skip tables matching the glob pattern '
+                      '(repeatable)')
+    parser.add_option('--collapse', action='store_true', default=False,
+                      help='document partitions and tables named '
+                      '<name>_<number> of the same structure as one table')
+
+
+def is_multi_schema(options):
+    """Returns True if --schema options may give several schemas"""
+    return (len(options.schemas) > 1 or
+            any(is_glob(pattern) for pattern in options.schemas))
+
+
+def create_filter(options):
+    from schema2rst.inspectors.base import TableFilter
+    return TableFilter(options.include, options.exclude)
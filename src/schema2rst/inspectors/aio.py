@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+import asyncio
+from sqlalchemy.engine.url import make_url
+from schema2rst import models
+from schema2rst.inspectors.base import (Column, SimpleInspector, TableFilter,
+                                        comment_parser)
+
+# bind parameters of sqlalchemy.text() style (not PostgreSQL casts)
+BINDPARAM = re.compile(r'(?<![:\w]):(\w+)(?!:)')
+
+
+class AsyncEngine(object):
+    """Connection settings for asyncio drivers (asyncpg, aiomysql)
+
+    SQLAlchemy has no dialect for these drivers here, so this object only
+    carries the parsed URL; AsyncInspector opens its own connection pool.
+    """
+    def __init__(self, url, pool_size=None):
+        self.url = make_url(url)
+        self.driver = self.url.get_driver_name()
+        self.pool_size = pool_size
+
+    def dispose(self):
+        pass
+
+
+class AsyncInspector(object):
+    """Inspector issuing schema-wide catalog queries concurrently
+
+    All catalog queries run at once over one event loop; tables are then
+    built from the in-memory snapshot with the same dict contract as
+    SimpleInspector.dump().
+    """
+    #: number of schema-wide catalog queries issued by load_snapshot()
+    concurrency = 4
+    comment_parser = comment_parser
+
+    min_family_size = SimpleInspector.min_family_size
+
+    def __init__(self, engine, schema=None, tables=None, collapse=False):
+        self.engine = engine
+        self.schema = schema
+        self.tables = tables or TableFilter()
+        self.collapse = collapse
+        self.default_schema_name = None
+        self.schema_name = schema
+        self.snapshot = None
+        self.table_stats = {}
+
+    def dump(self, jobs=1, previous=None):
+        ret = self.iterdump(jobs, previous)
+        ret.tables = list(ret.tables)
+        return ret
+
+    def iterdump(self, jobs=1, previous=None):
+        # the whole catalog is read at once, so *previous* is not used
+        pool_size = max(jobs, self.engine.pool_size or 1, self.concurrency)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.load_snapshot(pool_size))
+        finally:
+            loop.close()
+
+        tables = self.get_tables()
+        if self.collapse:
+            tables = self.collapse_tables(tables)
+
+        tables = (self.dump_table(table) for table in tables)
+        return models.Schema(name=self.schema or self.engine.url.database,
+                             tables=tables)
+
+    # tables are assembled and collapsed exactly like SimpleInspector does
+    dump_table = SimpleInspector.dump_table
+    collapse_tables = SimpleInspector.collapse_tables
+
+    def find_schemas(self, patterns):
+        """Returns names of schemas matching glob *patterns*"""
+        loop = asyncio.new_event_loop()
+        try:
+            names = loop.run_until_complete(self.load_schema_names(patterns))
+        finally:
+            loop.close()
+
+        return sorted(names)
+
+    async def load_schema_names(self, patterns):
+        schemas = TableFilter(include=patterns)
+        pool = await self.create_pool(1)
+        try:
+            rows = await self.query_catalog(pool, self.schema_names_query,
+                                            schemas, self.schema_name_column)
+        finally:
+            await self.close_pool(pool)
+
+        return [r[0] for r in rows if schemas.match(r[0])]
+
+    async def query_catalog(self, pool, query, table_filter=None,
+                            column='TABLE_NAME'):
+        """Executes a catalog *query* filtered by the table filter
+
+        Like SimpleInspector.query_catalog(), *query* binds the schema
+        name as :schema and has a %(tables)s placeholder for the
+        conditions of *table_filter* on *column*; bind parameters are
+        passed to the driver in its own style (see bindparam()).
+        """
+        if table_filter is None:
+            table_filter = self.tables
+
+        condition, params = table_filter.where(column)
+        params['schema'] = self.schema_name
+
+        args = []
+
+        def bind(match):
+            args.append(params[match.group(1)])
+            return self.bindparam(len(args))
+
+        query = BINDPARAM.sub(bind, query % dict(tables=condition))
+        return await self.fetch(pool, query, *args)
+
+    async def load_snapshot(self, pool_size):
+        pool = await self.create_pool(pool_size)
+        try:
+            self.default_schema_name = await self.get_default_schema_name(pool)
+            self.schema_name = self.schema or self.default_schema_name
+            self.snapshot = dict(tables={}, columns={}, primary_keys={},
+                                 foreign_keys={}, indexes={})
+            await asyncio.gather(self.load_tables(pool),
+                                 self.load_columns(pool),
+                                 self.load_constraints(pool),
+                                 self.load_indexes(pool))
+        finally:
+            await self.close_pool(pool)
+
+    def get_tables(self):
+        tables = []
+        for name, fullname in sorted(self.snapshot['tables'].items()):
+            # patterns LIKE can not express are not filtered in queries
+            if not self.tables.match(name):
+                continue
+            tables.append({'name': name, 'fullname': fullname})
+
+        return tables
+
+    def get_pk_constraint(self, table_name):
+        primary_keys = self.snapshot['primary_keys']
+        return primary_keys.get(table_name,
+                                dict(name=None, constrained_columns=[]))
+
+    def get_foreign_keys(self, table_name):
+        fkeys = self.snapshot['foreign_keys'].get(table_name, [])
+        return sorted(fkeys, key=lambda key: key['name'] or '')
+
+    def get_indexes(self, table_name):
+        indexes = self.snapshot['indexes'].get(table_name, [])
+        return sorted(indexes, key=lambda idx: idx['name'])
+
+    def get_columns(self, table_name):
+        primary_keys = self.get_pk_constraint(table_name)
+        primary_keys = primary_keys['constrained_columns']
+
+        foreign_keys = {}
+        for key in self.get_foreign_keys(table_name):
+            for column in key['constrained_columns']:
+                foreign_keys.setdefault(column, []).append(key)
+
+        columns = []
+        for row in self.snapshot['columns'].get(table_name, []):
+            column = Column(name=row['name'],
+                            type=row['type'],
+                            nullable=row['nullable'],
+                            default=row['default'],
+                            primary_key=row['name'] in primary_keys,
+                            foreign_keys=foreign_keys.get(row['name'], []))
+
+            options = self.get_column_options(row)
+            for key in column['foreign_keys']:
+                for refcolumn in key['referred_columns']:
+                    msg = "FK: %s.%s" % (key['referred_table'], refcolumn)
+                    options.append(msg)
+
+            column.set_comment(row['comment'] or '', options)
+            columns.append(column)
+
+        return columns
+
+    def get_column_options(self, row):
+        return []
+
+    def get_structure_signatures(self):
+        """Returns structure signatures of tables built from the snapshot
+
+        Names of constraints and indexes are not a part of a signature.
+        """
+        signatures = {}
+        for name in self.snapshot['tables']:
+            columns = [(c['name'], str(c['type']), c['nullable'], c['default'])
+                       for c in self.snapshot['columns'].get(name, [])]
+            primary_key = self.get_pk_constraint(name)['constrained_columns']
+            foreign_keys = sorted(repr((key['constrained_columns'],
+                                        key['referred_table'],
+                                        key['referred_columns']))
+                                  for key in self.get_foreign_keys(name))
+            indexes = sorted(repr((index['unique'], index['column_names']))
+                             for index in self.get_indexes(name))
+            signatures[name] = repr((columns, list(primary_key),
+                                     foreign_keys, indexes))
+
+        return signatures
+
+    def get_partitions(self):
+        return {}
+
+
+class AsyncPgSQLInspector(AsyncInspector):
+    """AsyncInspector for PostgreSQL using asyncpg
+
+    Column types are reported as format_type() strings.
+    """
+    async def create_pool(self, pool_size):
+        import asyncpg
+
+        url = self.engine.url
+        host = url.query.get('unix_socket', url.host)
+        return await asyncpg.create_pool(host=host, port=url.port,
+                                         user=url.username,
+                                         password=url.password,
+                                         database=url.database,
+                                         min_size=1, max_size=pool_size)
+
+    async def close_pool(self, pool):
+        await pool.close()
+
+    async def fetch(self, pool, query, *args):
+        async with pool.acquire() as conn:
+            return await conn.fetch(query, *args)
+
+    @staticmethod
+    def bindparam(position):
+        return '$%d' % position
+
+    schema_names_query = """SELECT nspname FROM pg_namespace
+                            WHERE nspname NOT LIKE 'pg\\_%%' AND
+                                  nspname <> 'information_schema' %(tables)s"""
+    schema_name_column = 'nspname'
+
+    async def get_default_schema_name(self, pool):
+        rows = await self.fetch(pool, "SELECT current_schema()")
+        return rows[0][0]
+
+    async def load_tables(self, pool):
+        query = """SELECT c.relname, obj_description(c.oid, 'pg_class')
+                   FROM pg_class c
+                   LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
+                   WHERE c.relkind = 'r' AND n.nspname = :schema
+                         %(tables)s"""
+        rows = await self.query_catalog(pool, query, column='c.relname')
+        self.snapshot['tables'] = dict((r[0], r[1]) for r in rows)
+
+    async def load_columns(self, pool):
+        query = """SELECT c.relname, a.attname,
+                          format_type(a.atttypid, a.atttypmod),
+                          a.attnotnull, pg_get_expr(d.adbin, d.adrelid),
+                          col_description(a.attrelid, a.attnum)
+                   FROM pg_attribute a
+                   JOIN pg_class c ON c.oid = a.attrelid
+                   JOIN pg_namespace n ON n.oid = c.relnamespace
+                   LEFT JOIN pg_attrdef d
+                     ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+                   WHERE
+                     c.relkind = 'r' AND a.attnum > 0 AND
+                     NOT a.attisdropped AND n.nspname = :schema %(tables)s
+                   ORDER BY c.relname, a.attnum"""
+        columns = self.snapshot['columns']
+        for r in await self.query_catalog(pool, query, column='c.relname'):
+            column = dict(name=r[1], type=r[2], nullable=not r[3],
+                          default=r[4], comment=r[5])
+            columns.setdefault(r[0], []).append(column)
+
+    async def load_constraints(self, pool):
+        query = """SELECT c.relname, con.conname, con.contype,
+                     array(SELECT a.attname::text
+                           FROM unnest(con.conkey)
+                                WITH ORDINALITY k(attnum, ord)
+                           JOIN pg_attribute a
+                             ON a.attrelid = con.conrelid AND
+                                a.attnum = k.attnum
+                           ORDER BY k.ord),
+                     rn.nspname, rc.relname,
+                     array(SELECT a.attname::text
+                           FROM unnest(con.confkey)
+                                WITH ORDINALITY k(attnum, ord)
+                           JOIN pg_attribute a
+                             ON a.attrelid = con.confrelid AND
+                                a.attnum = k.attnum
+                           ORDER BY k.ord)
+                   FROM pg_constraint con
+                   JOIN pg_class c ON c.oid = con.conrelid
+                   JOIN pg_namespace n ON n.oid = c.relnamespace
+                   LEFT JOIN pg_class rc ON rc.oid = con.confrelid
+                   LEFT JOIN pg_namespace rn ON rn.oid = rc.relnamespace
+                   WHERE con.contype IN ('p', 'f') AND
+                         n.nspname = :schema %(tables)s"""
+        for r in await self.query_catalog(pool, query, column='c.relname'):
+            if r[2] == 'p':
+                pk = dict(name=r[1], constrained_columns=list(r[3]))
+                self.snapshot['primary_keys'][r[0]] = pk
+            else:
+                referred_schema = r[4]
+                if referred_schema == self.schema_name:
+                    referred_schema = None
+
+                fk = dict(name=r[1],
+                          constrained_columns=list(r[3]),
+                          referred_schema=referred_schema,
+                          referred_table=r[5],
+                          referred_columns=list(r[6]),
+                          options={})
+                fkeys = self.snapshot['foreign_keys'].setdefault(r[0], [])
+                fkeys.append(fk)
+
+    async def load_indexes(self, pool):
+        query = """SELECT t.relname, i.relname, ix.indisunique,
+                     array(SELECT a.attname::text
+                           FROM unnest(ix.indkey::int2[])
+                                WITH ORDINALITY k(attnum, ord)
+                           JOIN pg_attribute a
+                             ON a.attrelid = t.oid AND a.attnum = k.attnum
+                           ORDER BY k.ord)
+                   FROM pg_index ix
+                   JOIN pg_class t ON t.oid = ix.indrelid
+                   JOIN pg_class i ON i.oid = ix.indexrelid
+                   JOIN pg_namespace n ON n.oid = t.relnamespace
+                   WHERE
+                     t.relkind = 'r' AND NOT ix.indisprimary AND
+                     n.nspname = :schema %(tables)s"""
+        indexes = self.snapshot['indexes']
+        for r in await self.query_catalog(pool, query, column='t.relname'):
+            index = dict(name=r[1], unique=r[2], column_names=list(r[3]))
+            indexes.setdefault(r[0], []).append(index)
+
+
+class AsyncMySQLInspector(AsyncInspector):
+    """AsyncInspector for MySQL using aiomysql
+
+    Column defaults are quoted like SQLAlchemy reflects them from
+    SHOW CREATE TABLE, except for CURRENT_TIMESTAMP and generated ones.
+    """
+    async def create_pool(self, pool_size):
+        import aiomysql
+
+        url = self.engine.url
+        params = dict(user=url.username, password=url.password or '',
+                      db=url.database, charset='utf8',
+                      minsize=1, maxsize=pool_size)
+        if 'unix_socket' in url.query:
+            params['unix_socket'] = url.query['unix_socket']
+        else:
+            params['host'] = url.host
+            params['port'] = url.port or 3306
+
+        return await aiomysql.create_pool(**params)
+
+    async def close_pool(self, pool):
+        pool.close()
+        await pool.wait_closed()
+
+    async def fetch(self, pool, query, *args):
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, args)
+                return await cursor.fetchall()
+
+    @staticmethod
+    def bindparam(position):
+        return '%s'
+
+    async def query_catalog(self, pool, query, table_filter=None,
+                            column='TABLE_NAME'):
+        # names are compared case-sensitively, like TableFilter.match()
+        column = 'CAST(%s AS BINARY)' % column
+        parent = super(AsyncMySQLInspector, self)
+        return await parent.query_catalog(pool, query, table_filter, column)
+
+    schema_names_query = """SELECT SCHEMA_NAME FROM information_schema.SCHEMATA
+                            WHERE SCHEMA_NAME NOT IN ('information_schema',
+                                                      'mysql', 'sys',
+                                                      'performance_schema')
+                                  %(tables)s"""
+    schema_name_column = 'SCHEMA_NAME'
+
+    async def get_default_schema_name(self, pool):
+        rows = await self.fetch(pool, "SELECT DATABASE()")
+        return rows[0][0]
+
+    async def load_tables(self, pool):
+        query = """SELECT TABLE_NAME, TABLE_COMMENT
+                   FROM information_schema.Tables
+                   WHERE TABLE_SCHEMA = :schema AND TABLE_TYPE = 'BASE TABLE'
+                         %(tables)s"""
+        tables = self.snapshot['tables']
+        for r in await self.query_catalog(pool, query):
+            fullname = re.sub('; InnoDB.*$', '', r[1] or '')
+            if fullname.startswith('InnoDB'):
+                fullname = None
+
+            tables[r[0]] = fullname
+
+    async def load_columns(self, pool):
+        query = """SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE,
+                          COLUMN_DEFAULT, COLLATION_NAME, EXTRA,
+                          COLUMN_COMMENT
+                   FROM information_schema.Columns
+                   WHERE TABLE_SCHEMA = :schema %(tables)s
+                   ORDER BY TABLE_NAME, ORDINAL_POSITION"""
+        columns = self.snapshot['columns']
+        for r in await self.query_catalog(pool, query):
+            column = dict(name=r[1], type=r[2], nullable=r[3] == 'YES',
+                          default=self.quote_default(r[4], r[6]),
+                          collation_name=r[5], extra=r[6], comment=r[7])
+            columns.setdefault(r[0], []).append(column)
+
+    async def load_constraints(self, pool):
+        query = """SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME,
+                          REFERENCED_TABLE_SCHEMA, REFERENCED_TABLE_NAME,
+                          REFERENCED_COLUMN_NAME
+                   FROM information_schema.KEY_COLUMN_USAGE
+                   WHERE TABLE_SCHEMA = :schema AND
+                         (CONSTRAINT_NAME = 'PRIMARY' OR
+                          REFERENCED_TABLE_NAME IS NOT NULL) %(tables)s
+                   ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION"""
+        primary_keys = self.snapshot['primary_keys']
+        foreign_keys = {}
+        for r in await self.query_catalog(pool, query):
+            if r[1] == 'PRIMARY':
+                pk = primary_keys.setdefault(r[0], dict(
+                    name=None, constrained_columns=[]))
+                pk['constrained_columns'].append(r[2])
+            else:
+                referred_schema = r[3]
+                if referred_schema == self.schema_name:
+                    referred_schema = None
+
+                fk = foreign_keys.get((r[0], r[1]))
+                if fk is None:
+                    fk = dict(name=r[1],
+                              constrained_columns=[],
+                              referred_schema=referred_schema,
+                              referred_table=r[4],
+                              referred_columns=[],
+                              options={})
+                    foreign_keys[(r[0], r[1])] = fk
+                    fkeys = self.snapshot['foreign_keys'].setdefault(r[0],
+                                                                     [])
+                    fkeys.append(fk)
+
+                fk['constrained_columns'].append(r[2])
+                fk['referred_columns'].append(r[5])
+
+    async def load_indexes(self, pool):
+        query = """SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+                   FROM information_schema.Statistics
+                   WHERE TABLE_SCHEMA = :schema AND INDEX_NAME != 'PRIMARY'
+                         %(tables)s
+                   ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"""
+        indexes = {}
+        for r in await self.query_catalog(pool, query):
+            index = indexes.get((r[0], r[1]))
+            if index is None:
+                index = dict(name=r[1], unique=not int(r[2]),
+                             column_names=[])
+                indexes[(r[0], r[1])] = index
+                self.snapshot['indexes'].setdefault(r[0], []).append(index)
+
+            index['column_names'].append(r[3])
+
+    @staticmethod
+    def quote_default(default, extra):
+        if default is None:
+            return None
+        elif 'DEFAULT_GENERATED' in (extra or ''):
+            return default
+        elif default.upper().startswith('CURRENT_TIMESTAMP'):
+            return default
+        else:
+            return "'%s'" % default.replace("'", "''")
+
+    def get_column_options(self, row):
+        options = []
+        collation_name = row['collation_name']
+        if collation_name and collation_name != 'utf8_general_ci':
+            options.append(collation_name)
+
+        if row['extra']:
+            options.append(row['extra'])
+
+        return options
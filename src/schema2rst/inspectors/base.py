@@ -15,16 +15,166 @@
 
 import re
 import json
+import time
+import threading
+import fnmatch
+import collections
+from concurrent import futures
+from functools import lru_cache
+from sqlalchemy import text
 from sqlalchemy.engine.reflection import Inspector
+from schema2rst import models
+
+
+class CommentParser(object):
+    """Parser of column comments
+
+    Results are cached by the comment text, so columns sharing a
+    (templated) comment are parsed only once. The parser is shared by
+    reflection worker threads; the elapsed time is updated under a lock.
+    """
+    pattern = re.compile(r'^(.*?)(?:(?:[(（](.*)[)）])|(?:\t(.*)))\s*$')
+
+    def __init__(self, maxsize=4096):
+        self.split = lru_cache(maxsize)(self._split)
+        self.metadata = lru_cache(maxsize)(self._metadata)
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    def add_elapsed(self, started):
+        elapsed = time.time() - started
+        with self.lock:
+            self.elapsed += elapsed
+
+    def _split(self, comment):
+        """Returns (fullname, note) of "fullname (note)" or None"""
+        started = time.time()
+        match = self.pattern.match(comment)
+        if match:
+            ret = (match.group(1).strip(),
+                   (match.group(2) or match.group(3)).strip())
+        else:
+            ret = None
+
+        self.add_elapsed(started)
+        return ret
+
+    def _metadata(self, comment):
+        """Returns fields of a JSON object comment, or None if not JSON
+
+        Do not modify the returned dict; it is shared between callers.
+        """
+        if not comment.lstrip().startswith('{'):
+            return None
+
+        started = time.time()
+        try:
+            metadata = json.loads(comment)
+        except ValueError:
+            metadata = None
+        finally:
+            self.add_elapsed(started)
+
+        if not isinstance(metadata, dict):
+            return None
+
+        return metadata
+
+    def stats(self):
+        """Returns the numbers of parsed and cached comments"""
+        split = self.split.cache_info()
+        metadata = self.metadata.cache_info()
+        with self.lock:
+            elapsed = self.elapsed
+
+        return dict(parsed=split.misses + metadata.misses,
+                    cached=split.hits + metadata.hits,
+                    elapsed=elapsed)
+
+
+comment_parser = CommentParser()
+
+#: names of a table family: <prefix>_<number>[_<number>...]
+FAMILY_PATTERN = re.compile(r'^(.+?)(?:_\d+)+$')
+
+
+def glob_to_like(pattern):
+    """Translates a glob pattern (* and ?) into a LIKE pattern
+
+    Returns None for patterns with character sets ([...]), which LIKE
+    can not express.
+    """
+    if '[' in pattern:
+        return None
+
+    pattern = pattern.replace('%', '\\%').replace('_', '\\_')
+    return pattern.replace('*', '%').replace('?', '_')
+
+
+class TableFilter(object):
+    """Glob patterns of table names to include and exclude
+
+    Inspectors push the filter into their catalog queries with where()
+    and check the names they get with match(), as where() leaves out
+    the patterns LIKE can not express. Names are compared
+    case-sensitively; MySQL inspectors compare them as binary strings
+    in the queries for the same reason.
+    """
+    def __init__(self, include=(), exclude=()):
+        self.include = tuple(include or ())
+        self.exclude = tuple(exclude or ())
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return 'TableFilter(include=%r, exclude=%r)' % (self.include,
+                                                        self.exclude)
+
+    def match(self, name):
+        if self.include and not any(fnmatch.fnmatchcase(name, pattern)
+                                    for pattern in self.include):
+            return False
+
+        return not any(fnmatch.fnmatchcase(name, pattern)
+                       for pattern in self.exclude)
+
+    def where(self, column):
+        """Returns (SQL condition on *column*, bind parameters)
+
+        The condition starts with AND (or is empty without patterns), to
+        be appended to a WHERE clause of a sqlalchemy.text() query. It
+        may select more names than match(): exclude patterns with
+        character sets are left out, and so are the include patterns if
+        one of them has a character set.
+        """
+        params = {}
+        conditions = []
+        includes = [glob_to_like(pattern) for pattern in self.include]
+        if includes and None not in includes:
+            likes = []
+            for i, pattern in enumerate(includes):
+                params['include_%d' % i] = pattern
+                likes.append('%s LIKE :include_%d' % (column, i))
+            conditions.append('(%s)' % ' OR '.join(likes))
+
+        for i, pattern in enumerate(self.exclude):
+            pattern = glob_to_like(pattern)
+            if pattern is not None:
+                params['exclude_%d' % i] = pattern
+                conditions.append('%s NOT LIKE :exclude_%d' % (column, i))
+
+        return ''.join(' AND ' + c for c in conditions), params
 
 
 class Column(dict):
     def set_comment(self, comment, options=[]):
         extra_comment = ", ".join(options)
-        match = re.match('^(.*?)(?:(?:[(（](.*)[)）])|(?:\t(.*)))\s*$', comment)
-        if match:
-            self['fullname'] = match.group(1).strip()
-            self['comment'] = (match.group(2) or match.group(3)).strip()
+        parsed = comment_parser.split(comment)
+        if parsed:
+            self['fullname'], self['comment'] = parsed
 
             if extra_comment:
                 self['comment'] += " (%s)" % extra_comment
@@ -37,31 +187,130 @@ class Column(dict):
 
 
 class SimpleInspector(Inspector):
-    def __init__(self, bind):
+    """Inspector dumping a schema of any database SQLAlchemy supports
+
+    *schema* is the name of the schema (namespace) to reflect instead of
+    the default one, and *tables* a TableFilter of the tables to dump.
+    With *collapse*, partitions and table families are dumped as one
+    table each (see collapse_tables()).
+    """
+    comment_parser = comment_parser
+
+    #: minimum number of tables named alike to be collapsed as a family
+    min_family_size = 2
+
+    def __init__(self, bind, schema=None, tables=None, collapse=False):
         super(SimpleInspector, self).__init__(bind)
+        self.schema = schema
+        self.tables = tables or TableFilter()
+        self.collapse = collapse
+        self.reflection_cache = {}
+        self.reflection_stats = {}
+        self.table_stats = {}
+
+    def reflect(self, kind, table_name, func):
+        """Returns cached reflection result of *kind* for the table
+
+        *func* is called only on the first request; the number of calls
+        and the elapsed time are counted in reflection_stats per kind.
+        """
+        key = (kind, table_name)
+        if key not in self.reflection_cache:
+            started = time.time()
+            self.reflection_cache[key] = func()
+
+            stats = self.reflection_stats.setdefault(kind, dict(count=0,
+                                                                elapsed=0.0))
+            stats['count'] += 1
+            stats['elapsed'] += time.time() - started
+
+        return self.reflection_cache[key]
+
+    @property
+    def schema_name(self):
+        """Name of the reflected schema"""
+        return self.schema or self.default_schema_name
+
+    def query_catalog(self, query, table_filter=None, column='TABLE_NAME'):
+        """Executes a catalog *query* filtered by the table filter
+
+        *query* binds the schema name as :schema and has a %(tables)s
+        placeholder for the conditions of *table_filter* (the filter of
+        the inspector by default) on *column*.
+        """
+        if table_filter is None:
+            table_filter = self.tables
+
+        condition, params = table_filter.where(column)
+        query = query % dict(tables=condition)
+        return self.bind.execute(text(query), schema=self.schema_name,
+                                 **params).fetchall()
+
+    def find_schemas(self, patterns):
+        """Returns names of schemas matching glob *patterns*"""
+        names = super(SimpleInspector, self).get_schema_names()
+        return sorted(name for name in names
+                      if any(fnmatch.fnmatchcase(name, pattern)
+                             for pattern in patterns))
 
     def get_tables(self, **kw):
         tables = []
-        table_names = super(SimpleInspector, self).get_table_names(**kw)
+        table_names = super(SimpleInspector, self).get_table_names(
+            schema=self.schema, **kw)
         for table_name in sorted(table_names):
-            table = {'name': table_name, 'fullname': ''}
-            tables.append(table)
+            if self.tables.match(table_name):
+                table = {'name': table_name, 'fullname': ''}
+                tables.append(table)
 
         return tables
 
     def get_indexes(self, table_name):
-        indexes = super(SimpleInspector, self).get_indexes(table_name)
-        return sorted(indexes, key=lambda idx: idx['name'])
+        def reflect():
+            indexes = super(SimpleInspector, self).get_indexes(
+                table_name, schema=self.schema)
+            return sorted(indexes, key=lambda idx: idx['name'])
+
+        return self.reflect('indexes', table_name, reflect)
+
+    def get_pk_constraint(self, table_name, schema=None, **kw):
+        parent = super(SimpleInspector, self)
+        if schema is not None or kw:
+            return parent.get_pk_constraint(table_name, schema, **kw)
+
+        return self.reflect('pk_constraint', table_name,
+                            lambda: parent.get_pk_constraint(table_name,
+                                                             self.schema))
 
     def get_foreign_keys(self, table_name):
-        fkeys = super(SimpleInspector, self).get_foreign_keys(table_name)
-        return sorted(fkeys, key=lambda key: key['name'])
+        def reflect():
+            fkeys = super(SimpleInspector, self).get_foreign_keys(
+                table_name, schema=self.schema)
+            return sorted(fkeys, key=lambda key: key['name'] or '')
+
+        return self.reflect('foreign_keys', table_name, reflect)
+
+    def get_foreign_key_index(self, table_name):
+        """Returns foreign keys of the table grouped by constrained column"""
+        def reflect():
+            index = {}
+            for key in self.get_foreign_keys(table_name):
+                for column in key['constrained_columns']:
+                    index.setdefault(column, []).append(key)
+
+            return index
+
+        return self.reflect('foreign_key_index', table_name, reflect)
+
+    def reflect_columns(self, table_name, **kw):
+        """Returns columns of the table as reflected by SQLAlchemy"""
+        return super(SimpleInspector, self).get_columns(
+            table_name, schema=self.schema, **kw)
 
     def get_columns(self, table_name, **kw):
         constraints = self.get_pk_constraint(table_name)
         primary_keys = constraints.get('constrained_columns')
-        foreign_keys = self.get_foreign_keys(table_name)
-        columns = super(SimpleInspector, self).get_columns(table_name, **kw)
+        foreign_keys = self.get_foreign_key_index(table_name)
+        columns = self.reflect_columns(table_name, **kw)
 
         # wrap column objects in Column class
         columns = [Column(c) for c in columns]
@@ -75,88 +324,347 @@ class SimpleInspector(Inspector):
             else:
                 column['primary_key'] = False
 
-            column['foreign_keys'] = []
-            for key in foreign_keys:
-                if column['name'] in key['constrained_columns']:
-                    column['foreign_keys'].append(key)
+            column['foreign_keys'] = list(foreign_keys.get(column['name'],
+                                                           []))
 
         return columns
 
+    def preload(self):
+        """Loads schema-wide catalog data before tables are reflected
+
+        Inspectors that batch catalog queries for the whole schema
+        override this; the loaded data is shared with fork()ed copies.
+        """
+        pass
+
+    def fork(self, bind):
+        """Returns a new inspector on *bind* sharing preloaded data"""
+        return self.__class__(bind, self.schema, self.tables, self.collapse)
+
+    def get_table_signatures(self):
+        """Returns {table name: change signature} computed from the catalog
+
+        A signature changes whenever the dumped table may change; tables
+        whose signature equals the one in a previous dump are not
+        reflected again. Returns None if the database is not supported.
+        """
+        return None
+
+    def get_structure_signatures(self):
+        """Returns {table name: structure signature} computed from the catalog
+
+        Unlike change signatures, a structure signature covers only the
+        columns, keys and indexes; it does not depend on the name,
+        comments or timestamps of the table, so tables of the same
+        structure have the same signature. Returns None if the database
+        is not supported.
+        """
+        return None
+
+    def get_partitions(self):
+        """Returns {table name: parent table name} of child tables
+
+        Children are partitions or inheriting tables of a parent in the
+        same schema; databases without them return an empty dict.
+        """
+        return {}
+
+    def collapse_tables(self, tables):
+        """Returns *tables* with partitions and table families collapsed
+
+        A child table whose structure is the same as its (root) parent's
+        becomes a member of the parent. Other tables named
+        <prefix>_<number> form a family if at least min_family_size of
+        them have the same structure; the family is dumped as a table
+        named <prefix> which is reflected from its first member (or from
+        the <prefix> table itself if it has the same structure).
+        Collapsed tables get the names of their members as 'members';
+        tables are left as is if structures are not available.
+        """
+        structures = self.get_structure_signatures()
+        if structures is None:
+            return tables
+
+        names = set(table['name'] for table in tables)
+        parents = self.get_partitions()
+
+        def root(name):
+            while parents.get(name) in names:
+                name = parents[name]
+            return name
+
+        members = collections.OrderedDict()
+        for name in sorted(names):
+            parent = root(name)
+            if (parent != name and structures.get(name) is not None and
+                    structures.get(name) == structures.get(parent)):
+                members.setdefault(parent, []).append(name)
+
+        collapsed = set(n for children in members.values() for n in children)
+        families = collections.OrderedDict()
+        for name in sorted(names - collapsed - set(members)):
+            matched = FAMILY_PATTERN.match(name)
+            if matched and structures.get(name) is not None:
+                family = families.setdefault(matched.group(1), {})
+                family.setdefault(structures[name], []).append(name)
+
+        sources = {}
+        for prefix, groups in families.items():
+            group = max(groups.values(), key=len)
+            if len(group) < self.min_family_size:
+                continue
+            elif prefix not in names:
+                sources[group[0]] = prefix
+            elif (prefix in members or prefix in collapsed or
+                  structures.get(prefix) != structures[group[0]]):
+                continue
+
+            members[prefix] = group
+            collapsed.update(group)
+
+        ret = []
+        for table in tables:
+            name = table['name']
+            if name in sources:
+                prefix = sources[name]
+                ret.append({'name': prefix, 'fullname': table['fullname'],
+                            'source': name, 'members': members[prefix]})
+            elif name in members:
+                ret.append(dict(table, members=members[name]))
+            elif name not in collapsed:
+                ret.append(table)
 
-    def dump(self):
-        ret = dict(name=self.engine.url.database, tables=[])
-        for table in self.get_tables():
-            table_name = table['name']
-
-            # rename table 'fullname' to 'comment'
-            table['comment'] = table['fullname']
-            table.pop('fullname',None)
-
-            table['columns'] = []
-            table['fields'] = ["name","type","nullable","pkey","default"]
-            col_map = {}
-            for column in self.get_columns(table_name):
-                '''
-                .. note::
-
-                    * fullname comes back as the field name when comment is null
-                    * fullname is the field's comment if it exists
-                    * comment will contain the field's collation as well as any foreign keys
-
-                '''
-                metadata = dict(name=column['name'],
-                                type=column['type'],
-                                nullable=column['nullable'],
-                                pkey=column['primary_key'],
-                                default=column['default'])
-
-                fk = column['comment']
-                if 'FK' not in fk and 'auto_increment' not in fk:
-                    pass
-                elif 'FK' in fk:
-                    # potentially remove collation string
-                    metadata['fkey'] = 'FK: ' + fk.split('FK: ', 1)[1]
-
-                    if 'fkey' not in table['fields']:
-                        table['fields'].append('fkey')
-
-                if column['fullname'] == column['name']:
-                    comment = ''
-                else:
-                    comment = column['fullname']
-
-                if comment != '' and len(comment):
-                    try:
-                        comment = json.loads(comment)
-                        metadata = {**metadata, **comment}
-                        for f in sorted(comment.keys()):
-                            if f not in table['fields']:
-                                table['fields'].append(f)
-                    except json.decoder.JSONDecodeError:
-                        metadata["description"] = comment
-
-                        if 'description' not in table['fields']:
-                            table['fields'].append('description')
-
-                table['columns'].append(metadata)
-
-            table['indexes'] = []
-            for index in self.get_indexes(table_name):
-                metadata = dict(name=index['name'],
-                                unique=index['unique'],
-                                column_names=index['column_names'])
-                table['indexes'].append(metadata)
-
-            table['foreign_keys'] = []
-            for fkey in self.get_foreign_keys(table_name):
-
-                metadata = dict(name=fkey['name'],
-                                constrained_columns=fkey['constrained_columns'],
-                                referred_table=fkey['referred_table'],
-                                referred_columns=fkey['referred_columns'],
-                                )
-                table['foreign_keys'].append(metadata)
-
-            ret['tables'].append(table)
+        return ret
 
+    def dump(self, jobs=1, previous=None):
+        """Returns the schema as a models.Schema (a dict view)
+
+        If *previous* dump is given, only tables whose signature changed
+        since then are reflected; the others are copied from it.
+        """
+        ret = self.iterdump(jobs, previous)
+        ret.tables = list(ret.tables)
+        return ret
+
+    def iterdump(self, jobs=1, previous=None):
+        """Returns the schema whose 'tables' is a generator
+
+        Tables are reflected one at a time while the generator is
+        consumed, and cached reflection data of a table is released once
+        it is yielded, so memory does not grow with the number of tables.
+        """
+        self.reflection_cache = {}
+        self.reflection_stats = {}
+        self.table_stats = {}
+
+        ret = models.Schema(name=self.schema or self.engine.url.database)
+        tables = self.get_tables()
+        if self.collapse:
+            tables = self.collapse_tables(tables)
+
+        signatures = self.get_table_signatures()
+        unchanged = {}
+        if signatures is not None:
+            ret.signatures = signatures
+            if previous:
+                # members of collapsed tables may have changed
+                collapsed = set(t['name'] for t in tables if t.get('members'))
+                old_signatures = previous.get('signatures') or {}
+                for table in previous['tables']:
+                    name = table['name']
+                    if table.get('members') or name in collapsed:
+                        continue
+
+                    if (name in signatures and
+                            old_signatures.get(name) == signatures[name]):
+                        unchanged[name] = table
+
+        ret.tables = self.iterdump_tables(tables, unchanged, jobs)
         return ret
+
+    def iterdump_tables(self, tables, unchanged, jobs):
+        changed = [t for t in tables if t['name'] not in unchanged]
+        if changed:
+            self.preload()
+
+        if jobs > 1:
+            dumped = self.dump_tables_concurrently(changed, jobs)
+        else:
+            dumped = (self.dump_table(table, release=True)
+                      for table in changed)
+
+        for table in tables:
+            if table['name'] in unchanged:
+                yield unchanged[table['name']]
+            else:
+                yield next(dumped)
+
+    def release(self, table_name):
+        """Drops cached reflection data of the table"""
+        for key in list(self.reflection_cache):
+            if key[1] == table_name:
+                del self.reflection_cache[key]
+
+        self.info_cache.clear()
+
+    def dump_tables_concurrently(self, tables, jobs):
+        """Reflects tables on a thread pool of *jobs* workers
+
+        Each worker thread opens its own connection from the engine's
+        pool, reflects with a fork()ed inspector and closes the
+        connection on the same thread (SQLite does not allow sharing
+        them). Tables are yielded in the order of *tables*; at most
+        2 * *jobs* of them are reflected ahead of the consumer. Stats of
+        the workers are merged before the last tables are yielded.
+        """
+        jobs = min(jobs, len(tables))
+        if jobs == 0:
+            return
+
+        local = threading.local()
+
+        def run_on_each_thread(executor, func):
+            # the tasks wait for each other, so each thread runs one
+            barrier = threading.Barrier(jobs)
+
+            def task():
+                barrier.wait()
+                return func()
+
+            tasks = [executor.submit(task) for _ in range(jobs)]
+            return [t.result() for t in tasks]
+
+        def connect():
+            local.inspector = self.fork(self.engine.connect())
+            return local.inspector
+
+        def close():
+            inspector = getattr(local, 'inspector', None)
+            if inspector is not None:
+                inspector.bind.close()
+
+        def dump_table(table):
+            return local.inspector.dump_table(table, release=True)
+
+        # the first tasks start all threads of the pool at once
+        executor = futures.ThreadPoolExecutor(max_workers=jobs)
+        pending = collections.deque()
+        try:
+            workers = run_on_each_thread(executor, connect)
+            for table in tables:
+                pending.append(executor.submit(dump_table, table))
+                if len(pending) >= jobs * 2:
+                    yield pending.popleft().result()
+
+            dumped = [future.result() for future in pending]
+            pending.clear()
+        finally:
+            for future in pending:
+                future.cancel()
+            run_on_each_thread(executor, close)
+            executor.shutdown()
+
+        for inspector in workers:
+            self.table_stats.update(inspector.table_stats)
+            for kind, stats in inspector.reflection_stats.items():
+                total = self.reflection_stats.setdefault(
+                    kind, dict(count=0, elapsed=0.0))
+                total['count'] += stats['count']
+                total['elapsed'] += stats['elapsed']
+
+        for table in dumped:
+            yield table
+
+    def dump_table(self, table, release=False):
+        # families are reflected from one of their members
+        table_name = table.get('source', table['name'])
+        started = time.time()
+
+        # FK objects are shared by the table and its constrained columns
+        foreign_keys = []
+        constraints = {}
+        for fkey in self.get_foreign_keys(table_name):
+            fkey = models.ForeignKey(
+                name=fkey['name'],
+                constrained_columns=fkey['constrained_columns'],
+                referred_table=fkey['referred_table'],
+                referred_columns=fkey['referred_columns'],
+            )
+            foreign_keys.append(fkey)
+            for column in fkey.constrained_columns:
+                constraints.setdefault(column, []).append(fkey)
+
+        columns = []
+        fields = ["name", "type", "nullable", "pkey", "default"]
+        for column in self.get_columns(table_name):
+            '''
+            .. note::
+
+                * fullname comes back as the field name when comment is null
+                * fullname is the field's comment if it exists
+                * comment will contain the field's collation as well as any
+                  foreign keys
+
+            '''
+            metadata = models.Column(
+                name=column['name'],
+                type=column['type'],
+                nullable=column['nullable'],
+                pkey=column['primary_key'],
+                default=column['default'],
+                foreign_keys=tuple(constraints.get(column['name'], ())),
+            )
+
+            fk = column['comment']
+            if 'FK' in fk:
+                # potentially remove collation string
+                metadata.fkey = 'FK: ' + fk.split('FK: ', 1)[1]
+
+                if 'fkey' not in fields:
+                    fields.append('fkey')
+
+            if column['fullname'] == column['name']:
+                comment = ''
+            else:
+                comment = column['fullname']
+
+            if comment != '' and len(comment):
+                parsed = comment_parser.metadata(comment)
+                if parsed is not None:
+                    metadata.metadata = parsed
+                    for f in sorted(parsed.keys()):
+                        if f not in fields:
+                            fields.append(f)
+                else:
+                    metadata.description = comment
+
+                    if 'description' not in fields:
+                        fields.append('description')
+
+            columns.append(metadata)
+
+        indexes = []
+        for index in self.get_indexes(table_name):
+            metadata = models.Index(name=index['name'],
+                                    unique=index['unique'],
+                                    column_names=index['column_names'])
+            indexes.append(metadata)
+
+        if release:
+            self.release(table_name)
+
+        # keyed by schema.table, as stats of several schemas are merged
+        if self.schema_name:
+            qualified_name = '%s.%s' % (self.schema_name, table['name'])
+        else:
+            qualified_name = table['name']
+        self.table_stats[qualified_name] = time.time() - started
+
+        # table 'fullname' is dumped as 'comment'
+        return models.Table(name=table['name'],
+                            comment=table['fullname'],
+                            columns=columns,
+                            fields=fields,
+                            indexes=indexes,
+                            foreign_keys=foreign_keys,
+                            members=table.get('members'))
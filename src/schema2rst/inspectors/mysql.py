@@ -14,35 +14,163 @@
 #  limitations under the License.
 
 import re
-from schema2rst.inspectors.base import SimpleInspector
+import sys
+from schema2rst.inspectors.base import SimpleInspector, TableFilter
 
 
 class MySQLInspector(SimpleInspector):
+    def __init__(self, bind, schema=None, tables=None, collapse=False):
+        super(MySQLInspector, self).__init__(bind, schema, tables, collapse)
+        self._column_details = None
+
+    def preload(self):
+        self.get_column_details()
+
+    def fork(self, bind):
+        inspector = super(MySQLInspector, self).fork(bind)
+        inspector._column_details = self._column_details
+        return inspector
+
+    def query_catalog(self, query, table_filter=None, column='TABLE_NAME'):
+        # names are compared case-sensitively, like TableFilter.match()
+        column = 'CAST(%s AS BINARY)' % column
+        return super(MySQLInspector, self).query_catalog(query, table_filter,
+                                                         column)
+
+    def find_schemas(self, patterns):
+        query = """SELECT SCHEMA_NAME
+                   FROM information_schema.SCHEMATA
+                   WHERE SCHEMA_NAME NOT IN ('information_schema', 'mysql',
+                                             'performance_schema', 'sys')
+                         %(tables)s
+                   ORDER BY SCHEMA_NAME"""
+        schemas = TableFilter(include=patterns)
+        rows = self.query_catalog(query, schemas, 'SCHEMA_NAME')
+        return [r[0] for r in rows if schemas.match(r[0])]
+
     def get_tables(self, **kw):
-        tables = super(MySQLInspector, self).get_tables(**kw)
-        for table in tables:
-            query = ("""SELECT TABLE_COMMENT
-                        FROM information_schema.Tables
-                        WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s'""" %
-                     (self.default_schema_name, table['name']))
-            r = self.bind.execute(query).fetchone()
-
-            table['fullname'] = re.sub('; InnoDB.*$', '', r[0])
-            if table['fullname'].startswith('InnoDB'):
-                table['fullname'] = None
+        query = """SELECT TABLE_NAME, TABLE_COMMENT
+                   FROM information_schema.Tables
+                   WHERE TABLE_SCHEMA = :schema AND
+                         TABLE_TYPE = 'BASE TABLE' %(tables)s"""
+        tables = []
+        for name, comment in sorted(self.query_catalog(query)):
+            if not self.tables.match(name):
+                continue
+
+            fullname = re.sub('; InnoDB.*$', '', comment or '')
+            if fullname.startswith('InnoDB'):
+                fullname = None
+
+            tables.append({'name': name, 'fullname': fullname})
 
         return tables
 
+    def get_table_signatures(self):
+        """Returns change signatures of tables
+
+        A signature combines CREATE_TIME, UPDATE_TIME and the comment of
+        the table with checksums of its columns, indexes and key columns.
+        """
+        queries = [
+            """SELECT TABLE_NAME,
+                      CONCAT_WS(':', CREATE_TIME, UPDATE_TIME, TABLE_COMMENT)
+               FROM information_schema.Tables
+               WHERE TABLE_SCHEMA = :schema %(tables)s""",
+            """SELECT TABLE_NAME,
+                      SUM(CRC32(CONCAT_WS(':', ORDINAL_POSITION, COLUMN_NAME,
+                                          COLUMN_TYPE, IS_NULLABLE,
+                                          COLUMN_DEFAULT, COLLATION_NAME,
+                                          EXTRA, COLUMN_COMMENT)))
+               FROM information_schema.Columns
+               WHERE TABLE_SCHEMA = :schema %(tables)s
+               GROUP BY TABLE_NAME""",
+            """SELECT TABLE_NAME,
+                      SUM(CRC32(CONCAT_WS(':', INDEX_NAME, SEQ_IN_INDEX,
+                                          COLUMN_NAME, NON_UNIQUE)))
+               FROM information_schema.Statistics
+               WHERE TABLE_SCHEMA = :schema %(tables)s
+               GROUP BY TABLE_NAME""",
+            """SELECT TABLE_NAME,
+                      SUM(CRC32(CONCAT_WS(':', CONSTRAINT_NAME, COLUMN_NAME,
+                                          REFERENCED_TABLE_NAME,
+                                          REFERENCED_COLUMN_NAME)))
+               FROM information_schema.KEY_COLUMN_USAGE
+               WHERE TABLE_SCHEMA = :schema %(tables)s
+               GROUP BY TABLE_NAME""",
+        ]
+        return self.query_signatures(queries)
+
+    def get_structure_signatures(self):
+        """Returns structure signatures of tables
+
+        A signature combines checksums of the columns, indexes and
+        foreign key columns of the table, without comments and names of
+        foreign key constraints (which are unique in a schema).
+        """
+        queries = [
+            """SELECT TABLE_NAME,
+                      SUM(CRC32(CONCAT_WS(':', ORDINAL_POSITION, COLUMN_NAME,
+                                          COLUMN_TYPE, IS_NULLABLE,
+                                          COLUMN_DEFAULT, COLLATION_NAME,
+                                          EXTRA)))
+               FROM information_schema.Columns
+               WHERE TABLE_SCHEMA = :schema %(tables)s
+               GROUP BY TABLE_NAME""",
+            """SELECT TABLE_NAME,
+                      SUM(CRC32(CONCAT_WS(':', INDEX_NAME, SEQ_IN_INDEX,
+                                          COLUMN_NAME, NON_UNIQUE)))
+               FROM information_schema.Statistics
+               WHERE TABLE_SCHEMA = :schema %(tables)s
+               GROUP BY TABLE_NAME""",
+            """SELECT TABLE_NAME,
+                      SUM(CRC32(CONCAT_WS(':', COLUMN_NAME,
+                                          REFERENCED_TABLE_NAME,
+                                          REFERENCED_COLUMN_NAME)))
+               FROM information_schema.KEY_COLUMN_USAGE
+               WHERE TABLE_SCHEMA = :schema AND
+                     REFERENCED_TABLE_NAME IS NOT NULL %(tables)s
+               GROUP BY TABLE_NAME""",
+        ]
+        return self.query_signatures(queries)
+
+    def query_signatures(self, queries):
+        """Returns {table name: values of *queries* joined with '|'}"""
+        signatures = {}
+        for query in queries:
+            for table_name, value in self.query_catalog(query):
+                signatures.setdefault(table_name, []).append(str(value))
+
+        return dict((name, '|'.join(values))
+                    for name, values in signatures.items())
+
+    def get_column_details(self):
+        """Returns column metadata for the whole schema
+
+        information_schema.Columns is queried once per inspector and the
+        rows are kept in memory, keyed by (table name, column name).
+        """
+        if self._column_details is None:
+            query = """SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE,
+                              COLLATION_NAME, EXTRA, COLUMN_COMMENT
+                       FROM information_schema.Columns
+                       WHERE TABLE_SCHEMA = :schema %(tables)s"""
+            details = {}
+            for r in self.query_catalog(query):
+                # types, collations and extras repeat across the schema
+                values = [sys.intern(v) if isinstance(v, str) else v
+                          for v in r[2:5]]
+                details[(r[0], r[1])] = tuple(values) + (r[5],)
+
+            self._column_details = details
+
+        return self._column_details
+
     def get_columns(self, table_name, **kw):
+        details = self.get_column_details()
         columns = super(MySQLInspector, self).get_columns(table_name, **kw)
         for column in columns:
-            query = ("""SELECT COLUMN_TYPE, COLLATION_NAME,
-                               EXTRA, COLUMN_COMMENT
-                        FROM information_schema.Columns
-                        WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s' AND
-                              COLUMN_NAME = '%s'""" %
-                     (self.default_schema_name, table_name, column['name']))
-            r = self.bind.execute(query).fetchone()
+            r = details[(table_name, column['name'])]
             column['type'] = r[0]
 
             options = []
@@ -13,35 +13,277 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-from schema2rst.inspectors.base import SimpleInspector
+from schema2rst.inspectors.base import SimpleInspector, TableFilter
 
 
 class PgSQLInspector(SimpleInspector):
+    def __init__(self, bind, schema=None, tables=None, collapse=False):
+        super(PgSQLInspector, self).__init__(bind, schema, tables, collapse)
+        self._snapshot = None
+
+    def preload(self):
+        self.get_snapshot()
+
+    def fork(self, bind):
+        inspector = super(PgSQLInspector, self).fork(bind)
+        inspector._snapshot = self._snapshot
+        return inspector
+
+    def find_schemas(self, patterns):
+        query = """SELECT nspname
+                   FROM pg_namespace
+                   WHERE nspname NOT LIKE 'pg\\_%%' AND
+                         nspname <> 'information_schema' %(tables)s
+                   ORDER BY nspname"""
+        schemas = TableFilter(include=patterns)
+        rows = self.query_catalog(query, schemas, 'nspname')
+        return [r[0] for r in rows if schemas.match(r[0])]
+
     def get_tables(self):
-        query = ("""SELECT c.relname, obj_description(c.oid, 'pg_class')
+        query = """SELECT c.relname, obj_description(c.oid, 'pg_class')
+                   FROM pg_class c
+                   LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
+                   WHERE c.relkind IN ('r', 'p') AND n.nspname = :schema
+                         %(tables)s"""
+        return [{'name': name, 'fullname': fullname} for name, fullname
+                in sorted(self.query_catalog(query, column='c.relname'))
+                if self.tables.match(name)]
+
+    def get_table_signatures(self):
+        """Returns change signatures of tables
+
+        A signature is an MD5 hash of the table comment and of its
+        columns (pg_attribute), constraints (pg_constraint) and indexes.
+        """
+        query = ("""SELECT c.relname, md5(concat_ws('|',
+                      obj_description(c.oid, 'pg_class'),
+                      (SELECT string_agg(concat_ws(':', a.attnum, a.attname,
+                                           format_type(a.atttypid,
+                                                       a.atttypmod),
+                                           a.attnotnull,
+                                           pg_get_expr(d.adbin, d.adrelid),
+                                           col_description(c.oid, a.attnum)),
+                                         ',' ORDER BY a.attnum)
+                       FROM pg_attribute a
+                       LEFT JOIN pg_attrdef d
+                         ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+                       WHERE
+                         a.attrelid = c.oid AND a.attnum > 0 AND
+                         NOT a.attisdropped),
+                      (SELECT string_agg(concat_ws(':', con.conname,
+                                           pg_get_constraintdef(con.oid)),
+                                         ',' ORDER BY con.conname)
+                       FROM pg_constraint con
+                       WHERE con.conrelid = c.oid),
+                      (SELECT string_agg(pg_get_indexdef(i.indexrelid),
+                                         ',' ORDER BY i.indexrelid)
+                       FROM pg_index i
+                       WHERE i.indrelid = c.oid)))
+                    FROM pg_class c
+                    LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE c.relkind IN ('r', 'p') AND n.nspname = :schema
+                          %(tables)s""")
+        return dict(self.query_catalog(query, column='c.relname'))
+
+    def get_structure_signatures(self):
+        """Returns structure signatures of tables
+
+        A signature is an MD5 hash of the columns (without comments),
+        the definitions of constraints and the key columns of indexes of
+        the table; names of constraints and indexes are not included.
+        """
+        query = ("""SELECT c.relname, md5(concat_ws('|',
+                      (SELECT string_agg(concat_ws(':', a.attnum, a.attname,
+                                           format_type(a.atttypid,
+                                                       a.atttypmod),
+                                           a.attnotnull,
+                                           pg_get_expr(d.adbin, d.adrelid)),
+                                         ',' ORDER BY a.attnum)
+                       FROM pg_attribute a
+                       LEFT JOIN pg_attrdef d
+                         ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+                       WHERE
+                         a.attrelid = c.oid AND a.attnum > 0 AND
+                         NOT a.attisdropped),
+                      (SELECT string_agg(def, ',' ORDER BY def)
+                       FROM (SELECT pg_get_constraintdef(con.oid) AS def
+                             FROM pg_constraint con
+                             WHERE con.conrelid = c.oid) defs),
+                      (SELECT string_agg(key, ',' ORDER BY key)
+                       FROM (SELECT concat_ws(':', i.indisunique,
+                                              i.indkey::text) AS key
+                             FROM pg_index i
+                             WHERE i.indrelid = c.oid) keys)))
                     FROM pg_class c
                     LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
-                    WHERE c.relkind = 'r' AND n.nspname = '%s'""" %
-                 self.default_schema_name)
-        fullnames = dict(self.bind.execute(query).fetchall())
+                    WHERE c.relkind IN ('r', 'p') AND n.nspname = :schema
+                          %(tables)s""")
+        return dict(self.query_catalog(query, column='c.relname'))
+
+    def get_partitions(self):
+        """Returns parents of partitions and inheriting tables"""
+        query = ("""SELECT c.relname, p.relname
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    JOIN pg_class p ON p.oid = i.inhparent
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE c.relkind IN ('r', 'p') AND n.nspname = :schema AND
+                          p.relnamespace = c.relnamespace %(tables)s
+                    ORDER BY i.inhseqno""")
+        parents = {}
+        for child, parent in self.query_catalog(query, column='c.relname'):
+            parents.setdefault(child, parent)
+
+        return parents
+
+    def get_snapshot(self):
+        """Returns columns, indexes and PK/FK constraints of the schema
+
+        The catalog is queried once per inspector for the whole
+        default schema; the result is kept in memory and serves
+        get_columns(), get_indexes(), get_pk_constraint() and
+        get_foreign_keys().
+        """
+        if self._snapshot is None:
+            snapshot = dict(columns={}, comments={}, indexes={},
+                            primary_keys={}, foreign_keys={})
 
-        tables = super(PgSQLInspector, self).get_tables()
-        for table in tables:
-            table['fullname'] = fullnames.get(table['name'])
+            if self.dialect.server_version_info >= (12,):
+                generated = 'a.attgenerated'
+            else:
+                generated = 'NULL'
 
-        return tables
+            query = ("""SELECT c.relname, a.attname,
+                               format_type(a.atttypid, a.atttypmod),
+                               pg_get_expr(d.adbin, d.adrelid),
+                               a.attnotnull,
+                               col_description(a.attrelid, a.attnum),
+                               %s
+                        FROM pg_attribute a
+                        LEFT JOIN pg_class c ON c.oid = a.attrelid
+                        LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
+                        LEFT JOIN pg_attrdef d
+                          ON d.adrelid = a.attrelid AND
+                             d.adnum = a.attnum AND a.atthasdef
+                        WHERE
+                          c.relkind IN ('r', 'p') AND a.attnum > 0 AND
+                          NOT a.attisdropped AND
+                          n.nspname = :schema %%(tables)s
+                        ORDER BY c.relname, a.attnum""" % generated)
+            for row in self.query_catalog(query, column='c.relname'):
+                relname, attname, comment = row[0], row[1], row[5]
+                columns = snapshot['columns'].setdefault(relname, [])
+                columns.append(row[1:])
+                comments = snapshot['comments'].setdefault(relname, {})
+                comments[attname] = comment
+
+            # types are resolved with domains and enums of the whole database
+            snapshot['domains'] = self.dialect._load_domains(self.bind)
+            snapshot['enums'] = dict(
+                ((rec['name'],), rec) if rec['visible']
+                else ((rec['schema'], rec['name']), rec)
+                for rec in self.dialect._load_enums(self.bind, schema='*')
+            )
+
+            query = ("""SELECT t.relname, i.relname, ix.indisunique,
+                          array(SELECT a.attname::text
+                                FROM unnest(ix.indkey::int2[])
+                                     WITH ORDINALITY k(attnum, ord)
+                                JOIN pg_attribute a
+                                  ON a.attrelid = t.oid AND
+                                     a.attnum = k.attnum
+                                ORDER BY k.ord)
+                        FROM pg_index ix
+                        JOIN pg_class t ON t.oid = ix.indrelid
+                        JOIN pg_class i ON i.oid = ix.indexrelid
+                        JOIN pg_namespace n ON n.oid = t.relnamespace
+                        WHERE
+                          t.relkind IN ('r', 'p') AND NOT ix.indisprimary AND
+                          n.nspname = :schema %(tables)s
+                        ORDER BY t.relname, i.relname""")
+            for relname, name, unique, columns in self.query_catalog(
+                    query, column='t.relname'):
+                index = dict(name=name, unique=unique,
+                             column_names=list(columns))
+                snapshot['indexes'].setdefault(relname, []).append(index)
+
+            query = ("""SELECT c.relname, con.conname, con.contype,
+                          array(SELECT a.attname::text
+                                FROM unnest(con.conkey)
+                                     WITH ORDINALITY k(attnum, ord)
+                                JOIN pg_attribute a
+                                  ON a.attrelid = con.conrelid AND
+                                     a.attnum = k.attnum
+                                ORDER BY k.ord),
+                          rn.nspname, rc.relname,
+                          array(SELECT a.attname::text
+                                FROM unnest(con.confkey)
+                                     WITH ORDINALITY k(attnum, ord)
+                                JOIN pg_attribute a
+                                  ON a.attrelid = con.confrelid AND
+                                     a.attnum = k.attnum
+                                ORDER BY k.ord)
+                        FROM pg_constraint con
+                        JOIN pg_class c ON c.oid = con.conrelid
+                        JOIN pg_namespace n ON n.oid = c.relnamespace
+                        LEFT JOIN pg_class rc ON rc.oid = con.confrelid
+                        LEFT JOIN pg_namespace rn ON rn.oid = rc.relnamespace
+                        WHERE con.contype IN ('p', 'f') AND
+                              n.nspname = :schema %(tables)s
+                        ORDER BY c.relname, con.conname""")
+            for row in self.query_catalog(query, column='c.relname'):
+                relname, conname, contype, columns = row[:4]
+                if contype == 'p':
+                    pk = dict(name=conname, constrained_columns=columns)
+                    snapshot['primary_keys'][relname] = pk
+                else:
+                    referred_schema = row[4]
+                    if referred_schema == self.schema_name:
+                        referred_schema = None
+
+                    fk = dict(name=conname,
+                              constrained_columns=columns,
+                              referred_schema=referred_schema,
+                              referred_table=row[5],
+                              referred_columns=row[6],
+                              options={})
+                    fkeys = snapshot['foreign_keys'].setdefault(relname, [])
+                    fkeys.append(fk)
+
+            self._snapshot = snapshot
+
+        return self._snapshot
+
+    def get_pk_constraint(self, table_name, schema=None, **kw):
+        if schema is not None:
+            return super(PgSQLInspector, self).get_pk_constraint(table_name,
+                                                                 schema, **kw)
+
+        primary_keys = self.get_snapshot()['primary_keys']
+        return primary_keys.get(table_name,
+                                dict(name=None, constrained_columns=[]))
+
+    def get_foreign_keys(self, table_name):
+        return list(self.get_snapshot()['foreign_keys'].get(table_name, []))
+
+    def get_indexes(self, table_name):
+        indexes = self.get_snapshot()['indexes'].get(table_name, [])
+        return self.reflect('indexes', table_name, lambda: list(indexes))
+
+    def reflect_columns(self, table_name, **kw):
+        snapshot = self.get_snapshot()
+        columns = []
+        for row in snapshot['columns'].get(table_name, []):
+            name, format_type, default, notnull, comment, generated = row
+            column = self.dialect._get_column_info(
+                name, format_type, default, notnull, snapshot['domains'],
+                snapshot['enums'], self.schema, comment, generated)
+            columns.append(column)
+
+        return columns
 
     def get_columns(self, table_name, **kw):
-        query = ("""SELECT a.attname, col_description(a.attrelid, a.attnum)
-                    FROM pg_attribute a
-                    LEFT JOIN pg_class c ON c.oid = a.attrelid
-                    LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
-                    WHERE
-                      c.relkind = 'r' AND a.attnum > 0 AND
-                      NOT a.attisdropped AND
-                      n.nspname = '%s' AND relname = '%s'""" %
-                 (self.default_schema_name, table_name))
-        comments = dict(self.bind.execute(query).fetchall())
+        comments = self.get_snapshot()['comments'].get(table_name, {})
 
         columns = super(PgSQLInspector, self).get_columns(table_name, **kw)
         for column in columns:
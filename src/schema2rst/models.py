@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import sys
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+class Model(Mapping):
+    """Base class of the dumped schema objects
+
+    Fields are kept in __slots__; a model is a read-only dict view of
+    them, so it is serialized and rendered just like the dicts of a
+    loaded dump. Optional fields are hidden from the view while None.
+    """
+    __slots__ = ()
+    _keys = ()
+    _optional = ()
+
+    def __init__(self, **kwargs):
+        for key in self.__slots__:
+            setattr(self, key, kwargs.pop(key, None))
+
+        if kwargs:
+            raise TypeError('unexpected fields: %s' % ', '.join(kwargs))
+
+    def __getitem__(self, key):
+        if key in self._keys:
+            value = getattr(self, key)
+            if value is not None or key not in self._optional:
+                return value
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key in self._keys:
+            if key not in self._optional or getattr(self, key) is not None:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self))
+
+    def __getstate__(self):
+        return tuple(getattr(self, key) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+
+class Schema(Model):
+    __slots__ = ('name', 'signatures', 'tables')
+    _keys = __slots__
+    _optional = ('signatures',)
+
+
+class Table(Model):
+    """Table of a schema
+
+    *members* lists the tables documented by this one (partitions and
+    tables of the same family); see SimpleInspector.collapse_tables().
+    """
+    __slots__ = ('name', 'comment', 'columns', 'fields', 'indexes',
+                 'foreign_keys', 'members')
+    _keys = __slots__
+    _optional = ('members',)
+
+
+class Column(Model):
+    """Column of a table
+
+    *metadata* is the dict decoded from a JSON comment; it is shared by
+    columns having the same comment and its keys are merged into the
+    view. *foreign_keys* holds the ForeignKey objects of the table
+    constraining the column; it is not a part of the view.
+    """
+    __slots__ = ('name', 'type', 'nullable', 'pkey', 'default', 'fkey',
+                 'description', 'metadata', 'foreign_keys')
+    _keys = ('name', 'type', 'nullable', 'pkey', 'default', 'fkey',
+             'description')
+    _optional = ('fkey', 'description')
+
+    def __init__(self, **kwargs):
+        super(Column, self).__init__(**kwargs)
+        self.name = sys.intern(str(self.name))
+        if self.type is not None:
+            self.type = sys.intern(str(self.type))
+
+    def __getitem__(self, key):
+        if self.metadata and key in self.metadata:
+            return self.metadata[key]
+
+        return super(Column, self).__getitem__(key)
+
+    def __iter__(self):
+        keys = list(super(Column, self).__iter__())
+        if self.metadata:
+            keys += [key for key in self.metadata if key not in keys]
+
+        return iter(keys)
+
+
+class Index(Model):
+    __slots__ = ('name', 'unique', 'column_names')
+    _keys = __slots__
+
+
+class ForeignKey(Model):
+    __slots__ = ('name', 'constrained_columns', 'referred_table',
+                 'referred_columns')
+    _keys = __slots__
+
+
+def serializable(obj):
+    """`default` hook of json and msgpack encoders
+
+    Models are encoded as dicts and anything else (e.g. SQLAlchemy
+    column types) as strings.
+    """
+    if isinstance(obj, Model):
+        return dict(obj)
+    else:
+        return str(obj)
@@ -18,9 +18,21 @@ import re
 import six
 import sys
 import unicodedata
+from functools import lru_cache
 
 
 def string_width(string):
+    """Returns the display width of *string* (wide chars count as 2)"""
+    try:
+        string.encode('ascii')
+    except UnicodeError:
+        return _wide_string_width(string)
+    else:
+        return len(string)
+
+
+@lru_cache(maxsize=4096)
+def _wide_string_width(string):
     width = 0
     for c in string:
         try:
@@ -36,11 +48,25 @@ def string_width(string):
 
 
 class RestructuredTextWriter:
+    """Writer of a reST document
+
+    Lines are buffered in memory and written to the file (or stdout) at
+    once on close(). Use it as a context manager to ensure the flush;
+    if the block raises, the buffer is discarded and an existing file is
+    left untouched.
+    """
     def __init__(self, filename=None):
-        if filename:
-            self.stream = io.open(filename, 'w', encoding='utf-8')
+        self.filename = filename
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
         else:
-            self.stream = io.open(sys.stdout.fileno(), 'w', encoding='utf-8')
+            self.buffer = None
 
     @staticmethod
     def conform_name(n):
@@ -48,20 +74,30 @@ class RestructuredTextWriter:
 
         Sphinx treates a trailing underscore as a hyperlink; some fields
         or table names my have a trailing underscore. This escapes that
-        underscore so it doesn't hyperlink.
-
-        NOTE: this, as a consequence, will escape all hyperlinks. TOFIX
+        underscore so it doesn't hyperlink. Hyperlink references (ending
+        with a backquote and underscores) are kept as they are.
         """
         if type(n) == str:
-            return re.sub(r"([_]+)$", r'\\\1', n)
+            return re.sub(r"(?<![`_])([_]+)$", r'\\\1', n)
         else:
             return n
 
     def close(self):
-        self.stream.close()
+        if self.buffer is None:  # already closed
+            return
+
+        content = six.u("").join(self.buffer)
+        self.buffer = None
+        if self.filename:
+            with io.open(self.filename, 'w', encoding='utf-8') as stream:
+                stream.write(content)
+        else:
+            with io.open(sys.stdout.fileno(), 'w', encoding='utf-8',
+                         closefd=False) as stream:
+                stream.write(content)
 
     def println(self, string):
-        self.stream.write(string + six.u("\n"))
+        self.buffer.append(string + six.u("\n"))
 
     def title(self, title, char="="):
 
@@ -100,12 +136,15 @@ class RestructuredTextWriter:
             self.listtable_column(header)
 
     def listtable_column(self, columns):
+        lines = []
         for i, column in enumerate(columns):
             column = self.conform_name(column)
             if i == 0:
-                self.println("   * - %s" % column)
+                lines.append("   * - %s\n" % column)
             else:
-                self.println("     - %s" % column)
+                lines.append("     - %s\n" % column)
+
+        self.buffer.append(six.u("").join(lines))
 
     def list_item(self, item):
         self.println("* %s" % item)
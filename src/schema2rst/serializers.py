@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import io
+import os
+import sys
+import json
+import yaml
+import itertools
+from collections import OrderedDict
+from schema2rst import models
+
+# use libyaml if available
+BaseDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+BaseLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class SchemaDumper(BaseDumper):
+    """SafeDumper writing models as mappings and other objects as strings
+
+    Unknown objects (e.g. SQLAlchemy column types) are written as their
+    string forms, so SQLAlchemy is not imported to register them.
+    """
+    def represent_object(self, data):
+        return self.represent_str(str(data))
+
+    def ignore_aliases(self, data):
+        # parsed comments are shared between columns; write them in full
+        return True
+
+
+SchemaDumper.add_representer(None, SchemaDumper.represent_object)
+SchemaDumper.add_multi_representer(models.Model, SchemaDumper.represent_dict)
+
+
+def documents(schema):
+    """Yields the schema without 'tables' and then each of its tables"""
+    header = dict((k, v) for k, v in schema.items() if k != 'tables')
+    return itertools.chain([header], schema['tables'])
+
+
+class YAMLSerializer(object):
+    binary = False
+
+    def __init__(self, streaming=False):
+        self.streaming = streaming
+
+    def serialize(self, data, **kwargs):
+        return yaml.dump(data, Dumper=SchemaDumper, **kwargs)
+
+    def dump(self, schema, stream):
+        if self.streaming:
+            for document in documents(schema):
+                stream.write(self.serialize(document, explicit_start=True))
+        else:
+            stream.write(self.serialize(schema))
+
+    def load(self, stream):
+        return yaml.load_all(stream, Loader=BaseLoader)
+
+
+class JSONSerializer(object):
+    binary = False
+
+    def __init__(self, streaming=False):
+        self.streaming = streaming
+
+    def serialize(self, data):
+        return json.dumps(data, default=models.serializable,
+                          ensure_ascii=False)
+
+    def dump(self, schema, stream):
+        if self.streaming:
+            for document in documents(schema):
+                stream.write(self.serialize(document) + '\n')
+        else:
+            stream.write(self.serialize(schema))
+
+    def load(self, stream):
+        # JSON Lines, or a JSON document spanning over lines
+        line = stream.readline()
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield json.loads(line + stream.read())
+            return
+
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class MessagePackSerializer(object):
+    binary = True
+
+    def __init__(self, streaming=False):
+        self.streaming = streaming
+
+    def dump(self, schema, stream):
+        import msgpack
+
+        packer = msgpack.Packer(default=models.serializable,
+                                use_bin_type=True)
+        if self.streaming:
+            for document in documents(schema):
+                stream.write(packer.pack(document))
+        else:
+            stream.write(packer.pack(schema))
+
+    def load(self, stream):
+        import msgpack
+
+        return iter(msgpack.Unpacker(stream, raw=False))
+
+
+#: format name -> (serializer class, streaming)
+FORMATS = OrderedDict([
+    ('yaml', (YAMLSerializer, False)),
+    ('yaml-stream', (YAMLSerializer, True)),
+    ('json', (JSONSerializer, False)),
+    ('jsonl', (JSONSerializer, True)),
+    ('msgpack', (MessagePackSerializer, False)),
+    ('msgpack-stream', (MessagePackSerializer, True)),
+])
+
+EXTENSIONS = {
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.msgpack': 'msgpack',
+    '.mpk': 'msgpack',
+}
+
+
+def get_serializer(format):
+    cls, streaming = FORMATS[format]
+    return cls(streaming)
+
+
+def guess_format(path):
+    """Returns the format for the extension of *path*, or None"""
+    if path:
+        extension = os.path.splitext(path)[1].lower()
+        return EXTENSIONS.get(extension)
+    else:
+        return None
+
+
+def sniff_format(path):
+    """Guesses the format of the dump from its first byte"""
+    with io.open(path, 'rb') as f:
+        head = f.read(1)
+
+    if head and (0x80 <= ord(head) <= 0x8f or head in (b'\xde', b'\xdf')):
+        return 'msgpack'
+    elif head == b'{':
+        return 'json'
+    else:
+        return 'yaml'
+
+
+def open_output(path, binary=False):
+    """Opens *path* (or stdout if None) for writing a dump"""
+    if binary:
+        if path:
+            return io.open(path, 'wb')
+        else:
+            return io.open(sys.stdout.fileno(), 'wb', closefd=False)
+    else:
+        if path:
+            return io.open(path, 'w', encoding='utf-8')
+        else:
+            return io.open(sys.stdout.fileno(), 'w', encoding='utf-8',
+                           closefd=False)
+
+
+def dump(schema, path=None, format='yaml'):
+    """Writes the schema to *path* (or stdout) in the format"""
+    serializer = get_serializer(format)
+    with open_output(path, serializer.binary) as output:
+        serializer.dump(schema, output)
+
+
+class StreamedTables(object):
+    """Tables of a streamed dump, parsed one at a time
+
+    The dump is read again on each iteration, so the tables can be
+    walked more than once without keeping them in memory.
+    """
+    def __init__(self, path, serializer):
+        self.path = path
+        self.serializer = serializer
+
+    def __iter__(self):
+        with open_input(self.path, self.serializer.binary) as stream:
+            documents = self.serializer.load(stream)
+            next(documents)  # skip the header
+            for table in documents:
+                yield table
+
+
+def open_input(path, binary=False):
+    """Opens *path* for reading a dump"""
+    if binary:
+        return io.open(path, 'rb')
+    else:
+        return io.open(path, encoding='utf-8')
+
+
+def load(path, format=None):
+    """Loads the dump stored in *path*
+
+    The format is guessed from the extension or the content unless
+    given. Single-document dumps are loaded at once. For streamed dumps,
+    'tables' of the returned dict is a StreamedTables parsing one table
+    at a time.
+    """
+    format = format or guess_format(path) or sniff_format(path)
+    serializer = get_serializer(format)
+    with open_input(path, serializer.binary) as stream:
+        schema = next(serializer.load(stream))
+
+    if 'tables' not in schema:
+        schema['tables'] = StreamedTables(path, serializer)
+
+    return schema
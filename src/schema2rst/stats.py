@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import io
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+#: number of the slowest tables reported by default
+DEFAULT_SLOWEST = 10
+
+
+def add_options(parser):
+    """Adds options to report Stats to the command line *parser*"""
+    parser.add_option('--stats', action='store_true', default=False,
+                      help='print timings of each phase to stderr')
+    parser.add_option('--stats-file', action='store',
+                      help='write timings of each phase as JSON')
+    parser.add_option('--slowest', action='store', type='int',
+                      default=DEFAULT_SLOWEST,
+                      help='number of the slowest tables to report '
+                      '(default: %d)' % DEFAULT_SLOWEST)
+
+
+class Stats(object):
+    """Timings of a run
+
+    Collects the elapsed time of each phase, the number and latency of
+    queries sent through watched engines, the reflection time of each
+    table and the per-kind reflection counts of inspectors.
+    """
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.queries = dict(count=0, elapsed=0.0)
+        self.tables = {}
+        self.reflection = {}
+        self.comments = None
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Measures the elapsed time of the with-block as phase *name*"""
+        started = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - started
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def watch(self, engine):
+        """Counts queries executed through *engine* (SQLAlchemy only)"""
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        if not isinstance(engine, Engine):
+            return
+
+        def before_cursor_execute(conn, *args):
+            conn.info.setdefault('query_started', []).append(time.time())
+
+        def after_cursor_execute(conn, *args):
+            elapsed = time.time() - conn.info['query_started'].pop()
+            with self.lock:
+                self.queries['count'] += 1
+                self.queries['elapsed'] += elapsed
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    def add_inspector(self, inspector):
+        """Takes the table and reflection timings of a dumped inspector
+
+        Table timings are keyed by schema.table, so inspectors of several
+        schemas can be added.
+        """
+        self.tables.update(getattr(inspector, 'table_stats', {}))
+        for kind, stats in getattr(inspector, 'reflection_stats', {}).items():
+            total = self.reflection.setdefault(kind, dict(count=0,
+                                                          elapsed=0.0))
+            total['count'] += stats['count']
+            total['elapsed'] += stats['elapsed']
+
+        if getattr(inspector, 'comment_parser', None):
+            self.comments = inspector.comment_parser.stats()
+
+    def slowest_tables(self, n=DEFAULT_SLOWEST):
+        """Returns [(schema.table, elapsed)] of the *n* slowest tables"""
+        tables = sorted(self.tables.items(), key=lambda t: (-t[1], t[0]))
+        return tables[:n]
+
+    def as_dict(self, slowest=DEFAULT_SLOWEST):
+        return dict(phases=dict(self.phases),
+                    queries=dict(self.queries),
+                    reflection=self.reflection,
+                    comments=self.comments,
+                    tables=len(self.tables),
+                    slowest_tables=[dict(name=name, elapsed=elapsed)
+                                    for name, elapsed
+                                    in self.slowest_tables(slowest)])
+
+    def write(self, stream=None, slowest=DEFAULT_SLOWEST):
+        """Writes a human readable summary to *stream* (stderr)"""
+        stream = stream or sys.stderr
+        for name, elapsed in self.phases.items():
+            stream.write('%-20s %9.3fs\n' % (name, elapsed))
+
+        stream.write('%-20s %9.3fs  %d queries\n' %
+                     ('queries', self.queries['elapsed'],
+                      self.queries['count']))
+        for kind, stats in sorted(self.reflection.items()):
+            stream.write('  %-18s %9.3fs  %d calls\n' %
+                         (kind, stats['elapsed'], stats['count']))
+
+        if self.comments:
+            stream.write('%-20s %9.3fs  %d parsed, %d cached\n' %
+                         ('comments', self.comments['elapsed'],
+                          self.comments['parsed'], self.comments['cached']))
+
+        tables = self.slowest_tables(slowest)
+        if tables:
+            stream.write('slowest tables:\n')
+            for name, elapsed in tables:
+                stream.write('  %-18s %9.3fs\n' % (name, elapsed))
+
+    def report(self, options):
+        """Reports the stats as requested by add_options() options"""
+        if options.stats:
+            self.write(slowest=options.slowest)
+
+        if options.stats_file:
+            with io.open(options.stats_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(self.as_dict(options.slowest), indent=2,
+                                   sort_keys=True))
@@ -0,0 +1,651 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import sqlalchemy
+from mock import patch, MagicMock
+
+from schema2rst import inspectors
+from schema2rst.inspectors.base import Column, CommentParser, TableFilter
+
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+
+class TestSimpleInspector(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, 'test.db')
+        self.engine = sqlalchemy.create_engine('sqlite:///%s' % path)
+        self.engine.execute("CREATE TABLE users ("
+                            "  id integer PRIMARY KEY,"
+                            "  name varchar(255))")
+        self.engine.execute("CREATE TABLE items ("
+                            "  id integer PRIMARY KEY,"
+                            "  name varchar(255))")
+        self.engine.execute("CREATE TABLE orders ("
+                            "  id integer PRIMARY KEY,"
+                            "  user_id integer REFERENCES users(id),"
+                            "  item_id integer REFERENCES items(id))")
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def test_dump_reflects_each_table_once(self):
+        inspector = inspectors.create_for(self.engine)
+        schema = inspector.dump()
+
+        self.assertEqual(['items', 'orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+        for kind in ('pk_constraint', 'foreign_keys', 'foreign_key_index',
+                     'indexes'):
+            self.assertEqual(3, inspector.reflection_stats[kind]['count'])
+
+        orders = schema['tables'][1]
+        self.assertEqual(['items', 'users'],
+                         sorted(k['referred_table']
+                                for k in orders['foreign_keys']))
+
+    def test_dump_with_jobs(self):
+        expected = inspectors.create_for(self.engine).dump()
+
+        inspector = inspectors.create_for(self.engine)
+        schema = inspector.dump(jobs=3)
+        self.assertEqual(repr(expected), repr(schema))
+        self.assertEqual(3, inspector.reflection_stats['indexes']['count'])
+
+    def test_dump_with_jobs_closes_connections_on_their_threads(self):
+        import threading
+
+        threads = {}
+
+        def checkout(dbapi_connection, record, proxy):
+            threads[id(dbapi_connection)] = threading.get_ident()
+
+        def checkin(dbapi_connection, record):
+            self.assertEqual(threads.pop(id(dbapi_connection)),
+                             threading.get_ident())
+
+        sqlalchemy.event.listen(self.engine, 'checkout', checkout)
+        sqlalchemy.event.listen(self.engine, 'checkin', checkin)
+
+        inspector = inspectors.create_for(self.engine)
+        tables = inspector.iterdump(jobs=2)['tables']
+        for _ in range(3):
+            next(tables)
+
+        # stats are merged once the last table is yielded
+        self.assertEqual(['items', 'orders', 'users'],
+                         sorted(inspector.table_stats))
+        self.assertEqual(3, inspector.reflection_stats['indexes']['count'])
+        self.assertEqual({}, threads)
+
+    def test_iterdump(self):
+        expected = inspectors.create_for(self.engine).dump()
+
+        inspector = inspectors.create_for(self.engine)
+        schema = inspector.iterdump()
+        self.assertEqual(expected['name'], schema['name'])
+
+        table = next(schema['tables'])
+        self.assertEqual(repr(expected['tables'][0]), repr(table))
+        self.assertEqual(1, inspector.reflection_stats['indexes']['count'])
+        self.assertEqual({}, inspector.reflection_cache)
+
+        self.assertEqual(repr(expected['tables'][1:]),
+                         repr(list(schema['tables'])))
+
+    def test_dump_with_previous(self):
+        from schema2rst.inspectors.base import SimpleInspector
+
+        signatures = dict(items='1', orders='1', users='1')
+
+        class Inspector(SimpleInspector):
+            def get_table_signatures(self):
+                return dict(signatures)
+
+        previous = Inspector(self.engine).dump()
+        self.assertEqual(signatures, previous['signatures'])
+        previous['tables'][0].comment = 'from previous dump'
+
+        # users is changed; items and orders are copied from previous dump
+        signatures['users'] = '2'
+        inspector = Inspector(self.engine)
+        schema = inspector.dump(previous=previous)
+        self.assertEqual(['items', 'orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+        self.assertEqual('from previous dump', schema['tables'][0]['comment'])
+        self.assertEqual(1, inspector.reflection_stats['indexes']['count'])
+
+        # items is dropped
+        del signatures['items']
+        self.engine.execute("DROP TABLE items")
+        schema = Inspector(self.engine).dump(previous=previous)
+        self.assertEqual(['orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+
+    def test_foreign_key_index(self):
+        inspector = inspectors.create_for(self.engine)
+        columns = dict((c['name'], c) for c in inspector.get_columns('orders'))
+
+        referred_tables = dict((name, [k['referred_table']
+                                       for k in c['foreign_keys']])
+                               for name, c in columns.items())
+        self.assertEqual([], referred_tables['id'])
+        self.assertEqual(['users'], referred_tables['user_id'])
+        self.assertEqual(['items'], referred_tables['item_id'])
+        self.assertTrue(columns['id']['primary_key'])
+        self.assertFalse(columns['user_id']['primary_key'])
+
+    def test_table_filter(self):
+        tables = TableFilter(include=['*s'], exclude=['item?'])
+        schema = inspectors.create_for(self.engine, tables=tables).dump()
+        self.assertEqual(['orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+
+    def test_schemas(self):
+        self.assertEqual([None], inspectors.resolve_schemas(self.engine, []))
+        self.assertEqual(['main', 'other'],
+                         inspectors.resolve_schemas(self.engine,
+                                                    ['ma*', 'other', 'x*']))
+
+        schemas = inspectors.dump_schemas(self.engine, ['main'],
+                                          TableFilter(include=['users']), 2)
+        self.assertEqual(['main'], [schema['name'] for schema in schemas])
+        self.assertEqual(['users'],
+                         [t['name'] for t in schemas[0]['tables']])
+
+    def test_collapse_tables(self):
+        inspector = inspectors.create_for(self.engine)
+        names = ['events', 'events_old', 'events_p1', 'events_p2',
+                 'log_1', 'log_2', 'shard', 'shard_1', 'shard_2']
+        tables = [dict(name=name, fullname='') for name in names]
+        structures = dict(events='a', events_old='b', events_p1='a',
+                          events_p2='a', log_1='c', log_2='c', shard='d',
+                          shard_1='e', shard_2='e')
+        partitions = dict(events_old='events', events_p1='events',
+                          events_p2='events_p1')
+        with patch.object(inspector, 'get_structure_signatures',
+                          return_value=structures), \
+                patch.object(inspector, 'get_partitions',
+                             return_value=partitions):
+            collapsed = inspector.collapse_tables(tables)
+
+        self.assertEqual([dict(name='events', fullname='',
+                               members=['events_p1', 'events_p2']),
+                          dict(name='events_old', fullname=''),
+                          dict(name='log', fullname='', source='log_1',
+                               members=['log_1', 'log_2']),
+                          dict(name='shard', fullname=''),
+                          dict(name='shard_1', fullname=''),
+                          dict(name='shard_2', fullname='')], collapsed)
+
+        # nothing is collapsed without structure signatures
+        self.assertEqual(tables, inspector.collapse_tables(tables))
+
+    def test_dump_with_collapse(self):
+        for name in ('events_2024_01', 'events_2024_02'):
+            self.engine.execute("CREATE TABLE %s ("
+                                "  id integer PRIMARY KEY,"
+                                "  user_id integer REFERENCES users(id))" %
+                                name)
+
+        inspector = inspectors.create_for(self.engine, collapse=True)
+        structures = dict(events_2024_01='a', events_2024_02='a',
+                          items='b', orders='c', users='b')
+        with patch.object(inspector, 'get_structure_signatures',
+                          return_value=structures):
+            schema = inspector.dump()
+
+        self.assertEqual(['events', 'items', 'orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+        events = schema['tables'][0]
+        self.assertEqual(['events_2024_01', 'events_2024_02'],
+                         events['members'])
+        self.assertEqual(['id', 'user_id'],
+                         sorted(c['name'] for c in events['columns']))
+        self.assertEqual(['users'],
+                         [k['referred_table'] for k in events['foreign_keys']])
+        self.assertNotIn('members', schema['tables'][1])
+
+
+class TestTableFilter(unittest.TestCase):
+    def test_match(self):
+        tables = TableFilter(include=['user*', 'items'], exclude=['*_log'])
+        self.assertTrue(tables.match('users'))
+        self.assertTrue(tables.match('items'))
+        self.assertFalse(tables.match('user_log'))
+        self.assertFalse(tables.match('orders'))
+        self.assertTrue(TableFilter().match('orders'))
+        self.assertFalse(TableFilter())
+
+    def test_where(self):
+        self.assertEqual(('', {}), TableFilter().where('name'))
+
+        tables = TableFilter(include=['user*', 'items'], exclude=['*_log?'])
+        condition, params = tables.where('c.relname')
+        self.assertEqual(" AND (c.relname LIKE :include_0 OR "
+                         "c.relname LIKE :include_1) AND "
+                         "c.relname NOT LIKE :exclude_0", condition)
+        self.assertEqual({'include_0': 'user%', 'include_1': 'items',
+                          'exclude_0': '%\\_log_'}, params)
+
+        # patterns with character sets are left to match()
+        tables = TableFilter(include=['log_[0-9]*', 'users'],
+                             exclude=['*_tmp', '*_[0-9]'])
+        condition, params = tables.where('name')
+        self.assertEqual(" AND name NOT LIKE :exclude_0", condition)
+        self.assertEqual({'exclude_0': '%\\_tmp'}, params)
+        self.assertTrue(tables.match('log_2024'))
+        self.assertFalse(tables.match('log_2024_tmp'))
+        self.assertFalse(tables.match('log_x'))
+
+
+class TestFindInspector(unittest.TestCase):
+    def test_builtin(self):
+        from schema2rst.inspectors.base import SimpleInspector
+        from schema2rst.inspectors.mysql import MySQLInspector
+
+        self.assertIs(MySQLInspector, inspectors.find_inspector('pymysql'))
+        self.assertIs(SimpleInspector, inspectors.find_inspector('pysqlite'))
+
+    @patch("schema2rst.inspectors.iter_entry_points")
+    def test_entry_point(self, iter_entry_points):
+        entry_point = MagicMock()
+        entry_point.name = 'pysqlite'
+        iter_entry_points.return_value = [entry_point]
+
+        self.assertIs(entry_point.load.return_value,
+                      inspectors.find_inspector('pysqlite'))
+        iter_entry_points.assert_called_with('schema2rst.inspectors')
+
+
+class TestCommentParser(unittest.TestCase):
+    def test_set_comment(self):
+        column = Column(name='id')
+        column.set_comment(u'商品ID（primary）', ['FK: items.id'])
+        self.assertEqual(u'商品ID', column['fullname'])
+        self.assertEqual('primary (FK: items.id)', column['comment'])
+
+        column.set_comment('user\tforeign')
+        self.assertEqual('user', column['fullname'])
+        self.assertEqual('foreign', column['comment'])
+
+        column.set_comment('')
+        self.assertEqual('id', column['fullname'])
+        self.assertEqual('', column['comment'])
+
+    def test_metadata(self):
+        parser = CommentParser()
+        self.assertEqual({'unit': 'yen'}, parser.metadata('{"unit": "yen"}'))
+        self.assertIsNone(parser.metadata('price of item'))
+        self.assertIsNone(parser.metadata('{broken'))
+        self.assertIsNone(parser.metadata('123'))
+
+        # parsed once per comment text
+        parser.metadata('{"unit": "yen"}')
+        self.assertEqual(1, parser.metadata.cache_info().hits)
+
+    def test_stats_from_threads(self):
+        from concurrent import futures
+
+        parser = CommentParser()
+        comments = ['name %d (note %d)' % (i, i) for i in range(200)]
+        with futures.ThreadPoolExecutor(4) as executor:
+            list(executor.map(parser.split, comments * 2))
+
+        stats = parser.stats()
+        self.assertEqual(400, stats['parsed'] + stats['cached'])
+        self.assertLessEqual(0.0, stats['elapsed'])
+
+
+class TestPgSQLInspector(unittest.TestCase):
+    ROWS = {
+        # table signatures share parts of the other catalog queries
+        'md5(': [],
+        "obj_description(c.oid, 'pg_class')": [
+            ('orders', 'Order'),
+            ('users', None),
+        ],
+        'col_description(a.attrelid': [
+            ('orders', 'id', 'integer', "nextval('orders_id_seq'::regclass)",
+             True, 'Order ID', ''),
+            ('orders', 'user_id', 'integer', None, False, None, ''),
+            ('users', 'id', 'integer', None, True, None, ''),
+            ('users', 'name', 'character varying(255)',
+             "'nobody'::character varying", False, 'Name', ''),
+        ],
+        'pg_constraint con': [
+            ('orders', 'orders_pkey', 'p', ['id'], None, None, None),
+            ('orders', 'orders_user_id_fkey', 'f', ['user_id'],
+             'public', 'users', ['id']),
+            ('users', 'users_pkey', 'p', ['id'], None, None, None),
+        ],
+        'pg_index ix': [
+            ('orders', 'orders_user_id', False, ['user_id']),
+        ],
+    }
+
+    def create_inspector(self):
+        from sqlalchemy.dialects.postgresql.base import PGDialect
+        from schema2rst.inspectors.pgsql import PgSQLInspector
+
+        rows = self.ROWS
+        queries = []
+
+        def execute(clause, **params):
+            query = str(clause)
+            queries.append(query)
+            for key in rows:
+                if key in query:
+                    return MagicMock(fetchall=lambda: rows[key])
+
+            # domains and enums
+            return MagicMock(fetchall=lambda: [])
+
+        dialect = PGDialect()
+        dialect.server_version_info = (13, 0)
+        dialect.default_schema_name = 'public'
+
+        bind = MagicMock(execute=execute)
+        bind.engine.dialect = dialect
+        bind.engine.url.database = 'test'
+        return PgSQLInspector(bind), queries
+
+    def test_dump(self):
+        inspector, queries = self.create_inspector()
+        schema = inspector.dump()
+
+        # catalog queries for the whole schema; none per table
+        self.assertEqual(7, len(queries))
+        self.assertEqual(['orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+
+        orders, users = schema['tables']
+        self.assertEqual(['INTEGER', 'INTEGER'],
+                         [str(c['type']) for c in orders['columns']])
+        self.assertEqual([False, True],
+                         [c['nullable'] for c in orders['columns']])
+        self.assertEqual([True, False],
+                         [c['pkey'] for c in orders['columns']])
+        self.assertEqual('Order ID', orders['columns'][0]['description'])
+        self.assertEqual('FK: users.id', orders['columns'][1]['fkey'])
+        self.assertEqual([dict(name='orders_user_id', unique=False,
+                               column_names=['user_id'])],
+                         orders['indexes'])
+
+        name = users['columns'][1]
+        self.assertEqual('VARCHAR(255)', str(name['type']))
+        self.assertEqual("'nobody'::character varying", name['default'])
+        self.assertEqual('Name', name['description'])
+        self.assertEqual([], users['indexes'])
+
+
+class TestAsyncMySQLInspector(unittest.TestCase):
+    ROWS = {
+        'DATABASE()': [('test',)],
+        'information_schema.Tables': [
+            ('users', 'User'),
+            ('orders', 'Order; InnoDB free: 1024 kB'),
+        ],
+        'information_schema.Columns': [
+            ('orders', 'id', 'int(11)', 'NO', None, None,
+             'auto_increment', 'Order ID'),
+            ('orders', 'user_id', 'int(11)', 'NO', None, None, '', ''),
+            ('users', 'id', 'int(11)', 'NO', None, None,
+             'auto_increment', ''),
+            ('users', 'name', 'varchar(255)', 'YES', 'nobody',
+             'latin1_swedish_ci', '', 'Name'),
+        ],
+        'information_schema.KEY_COLUMN_USAGE': [
+            ('orders', 'PRIMARY', 'id', None, None, None),
+            ('orders', 'orders_ibfk_1', 'user_id', 'test', 'users', 'id'),
+            ('users', 'PRIMARY', 'id', None, None, None),
+        ],
+        'information_schema.Statistics': [
+            ('orders', 'user_id', 1, 'user_id'),
+        ],
+    }
+
+    def create_inspector(self):
+        from schema2rst.inspectors.aio import AsyncMySQLInspector
+
+        rows = self.ROWS
+        queries = []
+
+        class Inspector(AsyncMySQLInspector):
+            async def create_pool(self, pool_size):
+                return None
+
+            async def close_pool(self, pool):
+                pass
+
+            async def fetch(self, pool, query, *args):
+                queries.append((query, args))
+                for key in rows:
+                    if key in query:
+                        return rows[key]
+
+        engine = inspectors.create_engine({'type': 'mysql+aiomysql',
+                                           'user': 'user', 'passwd': '',
+                                           'host': 'localhost',
+                                           'port': 3306, 'db': 'test'})
+        return Inspector(engine), queries
+
+    def test_dump(self):
+        inspector, queries = self.create_inspector()
+        schema = inspector.dump()
+
+        self.assertEqual(5, len(queries))
+        self.assertEqual('test', schema['name'])
+        self.assertEqual(['orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+
+        orders, users = schema['tables']
+        self.assertEqual('Order', orders['comment'])
+        self.assertEqual([dict(name='id', type='int(11)', nullable=False,
+                               pkey=True, default=None,
+                               description='Order ID'),
+                          dict(name='user_id', type='int(11)',
+                               nullable=False, pkey=False, default=None,
+                               fkey='FK: users.id')],
+                         orders['columns'])
+        self.assertEqual([dict(name='orders_ibfk_1',
+                               constrained_columns=['user_id'],
+                               referred_table='users',
+                               referred_columns=['id'])],
+                         orders['foreign_keys'])
+        self.assertEqual([dict(name='user_id', unique=False,
+                               column_names=['user_id'])],
+                         orders['indexes'])
+        self.assertEqual("'nobody'", users['columns'][1]['default'])
+
+    def test_dump_with_table_filter(self):
+        inspector, queries = self.create_inspector()
+        inspector.tables = TableFilter(include=['ord*'], exclude=['*_tmp'])
+        inspector.dump()
+
+        # the filter is bound to every catalog query of the snapshot
+        for query, args in queries[1:]:
+            self.assertIn("TABLE_SCHEMA = %s", query)
+            self.assertIn("(CAST(TABLE_NAME AS BINARY) LIKE %s) AND "
+                          "CAST(TABLE_NAME AS BINARY) NOT LIKE %s", query)
+            self.assertEqual(('test', 'ord%', '%\\_tmp'), args)
+
+    def test_dump_with_character_sets(self):
+        inspector, queries = self.create_inspector()
+        inspector.tables = TableFilter(include=['[ou]*'], exclude=['[u]*'])
+        schema = inspector.dump()
+
+        # LIKE has no character sets; the names are matched afterwards
+        self.assertEqual(('test',), queries[1][1])
+        self.assertEqual(['orders'], [t['name'] for t in schema['tables']])
+
+    def test_dump_with_collapse(self):
+        self.ROWS = {
+            'DATABASE()': [('test',)],
+            'information_schema.Tables': [
+                ('events_1', ''), ('events_2', ''), ('users', 'User'),
+            ],
+            'information_schema.Columns': [
+                ('events_1', 'id', 'int(11)', 'NO', None, None, '', ''),
+                ('events_2', 'id', 'int(11)', 'NO', None, None, '', ''),
+                ('users', 'id', 'int(11)', 'NO', None, None, '', ''),
+                ('users', 'name', 'varchar(255)', 'YES', None, None, '', ''),
+            ],
+            'information_schema.KEY_COLUMN_USAGE': [
+                ('events_1', 'PRIMARY', 'id', None, None, None),
+                ('events_2', 'PRIMARY', 'id', None, None, None),
+                ('users', 'PRIMARY', 'id', None, None, None),
+            ],
+            'information_schema.Statistics': [],
+        }
+        inspector, _ = self.create_inspector()
+        inspector.collapse = True
+        schema = inspector.dump()
+
+        self.assertEqual(['events', 'users'],
+                         [t['name'] for t in schema['tables']])
+        self.assertEqual(['events_1', 'events_2'],
+                         schema['tables'][0]['members'])
+        self.assertNotIn('members', schema['tables'][1])
+
+
+class TestAsyncPgSQLInspector(unittest.TestCase):
+    ROWS = {
+        'current_schema()': [('public',)],
+        'obj_description': [
+            ('users', 'User'),
+            ('orders', None),
+        ],
+        'col_description': [
+            ('orders', 'id', 'integer', True, None, 'Order ID'),
+            ('orders', 'user_id', 'integer', True, None, None),
+            ('users', 'id', 'integer', True,
+             "nextval('users_id_seq'::regclass)", None),
+            ('users', 'name', 'character varying(255)', False,
+             "'nobody'::character varying", 'Name'),
+        ],
+        'pg_constraint con': [
+            ('orders', 'orders_pkey', 'p', ['id'], None, None, None),
+            ('orders', 'orders_user_id_fkey', 'f', ['user_id'],
+             'public', 'users', ['id']),
+            ('users', 'users_pkey', 'p', ['id'], None, None, None),
+        ],
+        'pg_index ix': [
+            ('orders', 'orders_user_id', False, ['user_id']),
+            ('users', 'users_name', True, ['name']),
+        ],
+    }
+
+    def create_engine(self, **config):
+        config.update({'type': 'postgresql+asyncpg', 'user': 'user',
+                       'passwd': '', 'db': 'test'})
+        return inspectors.create_engine(config)
+
+    def create_inspector(self):
+        from schema2rst.inspectors.aio import AsyncPgSQLInspector
+
+        rows = self.ROWS
+        queries = []
+
+        class Inspector(AsyncPgSQLInspector):
+            async def create_pool(self, pool_size):
+                return None
+
+            async def close_pool(self, pool):
+                pass
+
+            async def fetch(self, pool, query, *args):
+                queries.append((query, args))
+                for key in rows:
+                    if key in query:
+                        return rows[key]
+
+        engine = self.create_engine(host='localhost', port=5432)
+        return Inspector(engine), queries
+
+    def test_dump(self):
+        inspector, queries = self.create_inspector()
+        schema = inspector.dump()
+
+        self.assertEqual(5, len(queries))
+        for query, args in queries[1:]:
+            self.assertIn('nspname = $1', query)
+            self.assertEqual(('public',), args)
+
+        self.assertEqual('test', schema['name'])
+        self.assertEqual(['orders', 'users'],
+                         [t['name'] for t in schema['tables']])
+
+        orders, users = schema['tables']
+        self.assertEqual('User', users['comment'])
+        self.assertEqual([dict(name='id', type='integer', nullable=False,
+                               pkey=True, default=None,
+                               description='Order ID'),
+                          dict(name='user_id', type='integer',
+                               nullable=False, pkey=False, default=None,
+                               fkey='FK: users.id')],
+                         orders['columns'])
+        self.assertEqual([dict(name='orders_user_id_fkey',
+                               constrained_columns=['user_id'],
+                               referred_table='users',
+                               referred_columns=['id'])],
+                         orders['foreign_keys'])
+        self.assertEqual([dict(name='orders_user_id', unique=False,
+                               column_names=['user_id'])],
+                         orders['indexes'])
+        self.assertEqual([dict(name='users_name', unique=True,
+                               column_names=['name'])],
+                         users['indexes'])
+
+        name = users['columns'][1]
+        self.assertEqual('character varying(255)', name['type'])
+        self.assertTrue(name['nullable'])
+        self.assertEqual("'nobody'::character varying", name['default'])
+        self.assertEqual('Name', name['description'])
+
+    def test_dump_with_table_filter(self):
+        inspector, queries = self.create_inspector()
+        inspector.tables = TableFilter(include=['ord*'])
+        inspector.dump()
+
+        for query, args in queries[1:]:
+            self.assertIn('relname LIKE $2)', query)
+            self.assertEqual(('public', 'ord%'), args)
+
+    def test_create_pool(self):
+        import asyncio
+        from schema2rst.inspectors.aio import AsyncPgSQLInspector
+
+        params = []
+
+        async def create_pool(**kwargs):
+            params.append(kwargs)
+
+        asyncpg = MagicMock(create_pool=create_pool)
+        with patch.dict(sys.modules, asyncpg=asyncpg):
+            loop = asyncio.new_event_loop()
+            try:
+                engine = self.create_engine(host='db.example.com', port=5433)
+                inspector = AsyncPgSQLInspector(engine)
+                loop.run_until_complete(inspector.create_pool(4))
+
+                # host of unix_socket is the directory of the socket
+                engine = self.create_engine(unix_socket='/var/run/pgsql')
+                inspector = AsyncPgSQLInspector(engine)
+                loop.run_until_complete(inspector.create_pool(2))
+            finally:
+                loop.close()
+
+        self.assertEqual(('db.example.com', 5433, 'user', 'test', 4),
+                         (params[0]['host'], params[0]['port'],
+                          params[0]['user'], params[0]['database'],
+                          params[0]['max_size']))
+        self.assertEqual('/var/run/pgsql', params[1]['host'])
+        self.assertEqual(2, params[1]['max_size'])
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import json
+import pickle
+import yaml
+
+from schema2rst import models
+from schema2rst.serializers import SchemaDumper
+
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+
+class TestModels(unittest.TestCase):
+    def setUp(self):
+        fkey = models.ForeignKey(name='fk_item', constrained_columns=['id'],
+                                 referred_table='items',
+                                 referred_columns=['id'])
+        column = models.Column(name='id', type='int', nullable=False,
+                               pkey=True, default=None,
+                               fkey='FK: items.id', foreign_keys=(fkey,))
+        self.table = models.Table(name='orders', comment='', fields=['name'],
+                                  columns=[column], indexes=[],
+                                  foreign_keys=[fkey])
+        self.schema = models.Schema(name='test', tables=[self.table])
+
+    def test_view(self):
+        column = self.table['columns'][0]
+        self.assertEqual(dict(name='id', type='int', nullable=False,
+                              pkey=True, default=None, fkey='FK: items.id'),
+                         dict(column))
+        self.assertIs(self.table['foreign_keys'][0], column.foreign_keys[0])
+
+        # optional fields are hidden while None
+        self.assertEqual(['name', 'tables'], list(self.schema))
+        self.assertNotIn('members', self.table)
+        self.assertNotIn('description', column)
+        with self.assertRaises(KeyError):
+            column['description']
+
+        # fields of the JSON comment are merged
+        column.metadata = {'unit': 'yen', 'type': 'money'}
+        self.assertEqual(['name', 'type', 'nullable', 'pkey', 'default',
+                          'fkey', 'unit'], list(column))
+        self.assertEqual('money', column['type'])
+
+    def test_interned(self):
+        name = ''.join(['user', '_id'])
+        column = models.Column(name=name, type=name)
+        self.assertIs(sys.intern('user_id'), column.name)
+        self.assertIs(column.name, column.type)
+
+    def test_serialize(self):
+        expected = {'name': 'test', 'tables': [json.loads(json.dumps(
+            {'name': 'orders', 'comment': '', 'fields': ['name'],
+             'columns': [dict(self.table['columns'][0])], 'indexes': [],
+             'foreign_keys': [dict(self.table['foreign_keys'][0])]}))]}
+
+        data = json.dumps(self.schema, default=models.serializable)
+        self.assertEqual(expected, json.loads(data))
+
+        data = yaml.dump(self.schema, Dumper=SchemaDumper)
+        self.assertEqual(expected, yaml.safe_load(data))
+
+        self.assertEqual(self.schema, pickle.loads(pickle.dumps(self.schema)))
@@ -6,7 +6,9 @@ import tempfile
 import sqlalchemy
 import testing.mysqld
 
+from schema2rst import inspectors
 from schema2rst.commands import graph, rst
+from schema2rst.inspectors.base import TableFilter
 
 import sys
 if sys.version_info < (2, 7):
@@ -67,3 +69,48 @@ class TestSchema2rst(unittest.TestCase):
                              io.open(output, encoding='utf-8').read())
         finally:
             os.unlink(output)
+
+    def test_information_schema_query_count(self):
+        engine = sqlalchemy.create_engine(self.mysqld.url(charset='utf8'))
+
+        def count_queries(num_tables):
+            for i in range(num_tables):
+                engine.execute("CREATE TABLE IF NOT EXISTS table%d "
+                               "(id int primary key comment 'ID %d')" %
+                               (i, i))
+
+            queries = []
+
+            def before_cursor_execute(conn, cursor, statement, *args):
+                if 'information_schema.' in statement:
+                    queries.append(statement)
+
+            sqlalchemy.event.listen(engine, 'before_cursor_execute',
+                                    before_cursor_execute)
+            try:
+                schema = inspectors.create_for(engine).dump()
+            finally:
+                sqlalchemy.event.remove(engine, 'before_cursor_execute',
+                                        before_cursor_execute)
+
+            self.assertEqual(num_tables, len(schema['tables']))
+            return len(queries)
+
+        try:
+            # catalog queries cover the whole schema, not each table
+            self.assertEqual(count_queries(2), count_queries(20))
+        finally:
+            engine.dispose()
+
+    def test_table_filter(self):
+        engine = sqlalchemy.create_engine(self.mysqld.url(charset='utf8'))
+        try:
+            for name in ('users', 'user_logs', 'userXlogs', 'items'):
+                engine.execute("CREATE TABLE %s (id int primary key)" % name)
+
+            tables = TableFilter(include=['user*'], exclude=['user_logs'])
+            schema = inspectors.create_for(engine, tables=tables).dump()
+            self.assertEqual(['userXlogs', 'users'],
+                             [table['name'] for table in schema['tables']])
+        finally:
+            engine.dispose()
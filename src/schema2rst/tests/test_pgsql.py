@@ -6,6 +6,7 @@ import tempfile
 import sqlalchemy
 import testing.postgresql
 
+from schema2rst import inspectors
 from schema2rst.commands import graph, rst
 
 import sys
@@ -80,3 +81,51 @@ class TestSchema2rst(unittest.TestCase):
                              io.open(output, encoding='utf-8').read())
         finally:
             os.unlink(output)
+
+    def test_snapshot_query_count(self):
+        engine = sqlalchemy.create_engine(self.pgsql.url())
+
+        def count_queries(num_tables):
+            for i in range(num_tables):
+                engine.execute("CREATE TABLE IF NOT EXISTS table%d "
+                               "(id int primary key, "
+                               " parent_id int references table%d(id))" %
+                               (i, i))
+                engine.execute("COMMENT ON COLUMN table%d.id IS 'ID %d'" %
+                               (i, i))
+                engine.execute("CREATE INDEX IF NOT EXISTS table%d_parent_id "
+                               "ON table%d (parent_id)" % (i, i))
+
+            queries = []
+
+            def before_cursor_execute(conn, cursor, statement, *args):
+                queries.append(statement)
+
+            inspector = inspectors.create_for(engine)
+            sqlalchemy.event.listen(engine, 'before_cursor_execute',
+                                    before_cursor_execute)
+            try:
+                schema = inspector.dump()
+            finally:
+                sqlalchemy.event.remove(engine, 'before_cursor_execute',
+                                        before_cursor_execute)
+
+            self.assertEqual(num_tables, len(schema['tables']))
+            for table in schema['tables']:
+                fkeys = table['foreign_keys']
+                self.assertEqual(1, len(fkeys))
+                self.assertEqual(['parent_id'],
+                                 fkeys[0]['constrained_columns'])
+                self.assertEqual([True, False],
+                                 [c['pkey'] for c in table['columns']])
+                self.assertEqual(['INTEGER', 'INTEGER'],
+                                 [str(c['type']) for c in table['columns']])
+                self.assertEqual([table['name'] + '_parent_id'],
+                                 [idx['name'] for idx in table['indexes']])
+            return len(queries)
+
+        try:
+            # the whole schema is read with the same catalog queries
+            self.assertEqual(count_queries(2), count_queries(20))
+        finally:
+            engine.dispose()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import shutil
+import tempfile
+
+from schema2rst.rstwriter import RestructuredTextWriter, string_width
+
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+
+class TestRestructuredTextWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'output.rst')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_buffered_write(self):
+        doc = RestructuredTextWriter(self.path)
+        doc.title(u'商品')
+        doc.listtable(['name', 'type_'])
+        self.assertFalse(os.path.exists(self.path))
+
+        doc.close()
+        doc.close()  # closing twice is harmless
+        self.assertEqual(u'\n商品\n====\n\n'
+                         u'.. list-table::\n'
+                         u'   :header-rows: 1\n'
+                         u'\n'
+                         u'   * - name\n'
+                         u'     - type\\_\n',
+                         io.open(self.path, encoding='utf-8').read())
+
+    def test_context_manager(self):
+        with RestructuredTextWriter(self.path) as doc:
+            doc.list_item('KEY: id (id)')
+
+        self.assertEqual(u'* KEY: id (id)\n',
+                         io.open(self.path, encoding='utf-8').read())
+
+        with self.assertRaises(RuntimeError):
+            with RestructuredTextWriter(self.path) as doc:
+                doc.list_item('partial')
+                raise RuntimeError
+
+        # the previous document survives a failed rendering
+        self.assertEqual(u'* KEY: id (id)\n',
+                         io.open(self.path, encoding='utf-8').read())
+
+    def test_string_width(self):
+        self.assertEqual(4, string_width('name'))
+        self.assertEqual(6, string_width(u'商品ID'))
+        self.assertEqual(0, string_width(''))
@@ -2,10 +2,13 @@
 
 import io
 import os
+import yaml
 import tempfile
 from mock import patch
 
+from schema2rst import serializers
 from schema2rst.commands import graph
+from schema2rst.rstwriter import RestructuredTextWriter
 
 import sys
 if sys.version_info < (2, 7):
@@ -36,6 +39,19 @@ class TestSchema2graph(unittest.TestCase):
             graph.parse_option(['-c', 'config.yaml', '-d', 'dump.yaml',
                                 '-o', 'output.rst'])
 
+        # --depth without --focus
+        with self.assertRaises(RuntimeError):
+            graph.parse_option(['-c', 'config.yaml', '--depth', '2'])
+
+        # both --focus and --split
+        with self.assertRaises(RuntimeError):
+            graph.parse_option(['-c', 'config.yaml', '--focus', 'users',
+                                '-s', 'clusters'])
+
+        # --include with -d
+        with self.assertRaises(RuntimeError):
+            graph.parse_option(['-d', 'dump.yaml', '--include', 'user*'])
+
         # success (1)
         option, args = graph.parse_option(['-c', 'config.yaml',
                                            '-o', 'output.rst'])
@@ -77,3 +93,90 @@ class TestSchema2graph(unittest.TestCase):
                              io.open(output, encoding='utf-8').read())
         finally:
             os.unlink(output)
+
+    def test_from_streamed_datafile(self):
+        datafile = os.path.join(os.path.dirname(__file__),
+                                'yaml/mysql_comments.yaml')
+        schema = yaml.safe_load(self.readfile(datafile))
+
+        for format, suffix in (('yaml-stream', '.yaml'), ('jsonl', '.jsonl')):
+            try:
+                fd, output = tempfile.mkstemp()
+                os.close(fd)
+                fd, streamfile = tempfile.mkstemp(suffix)
+                os.close(fd)
+                serializers.dump(schema, streamfile, format)
+
+                graph.main(['-d', streamfile, '-o', output])
+                self.assertEqual(self.readfile('rst/mysql_comments_graph.rst'),
+                                 io.open(output, encoding='utf-8').read())
+            finally:
+                os.unlink(output)
+                os.unlink(streamfile)
+
+    def test_graph_index(self):
+        def table(name, *referred_tables):
+            return dict(name=name, comment='',
+                        foreign_keys=[dict(referred_table=t)
+                                      for t in referred_tables])
+
+        index = graph.GraphIndex([table('users'),
+                                  table('orders', 'users', 'users', 'items'),
+                                  table('items'),
+                                  table('logs'),
+                                  table('reviews', 'orders')])
+
+        # parallel edges are merged
+        self.assertEqual(['users', 'items'], index.edges['orders'])
+        self.assertEqual([['users', 'orders', 'items', 'reviews'], ['logs']],
+                         index.components())
+        self.assertEqual(['users', 'orders'],
+                         index.neighbourhood('users', 1))
+        self.assertEqual(['users', 'orders', 'items', 'reviews'],
+                         index.neighbourhood('users', 2))
+        self.assertEqual(['logs'], index.neighbourhood('logs', 3))
+
+    def test_collapsed_tables(self):
+        users = dict(name='users', comment='', foreign_keys=[],
+                     members=['users_1', 'users_2'])
+        orders = dict(name='orders', comment='',
+                      foreign_keys=[dict(referred_table='users_1'),
+                                    dict(referred_table='users_2')])
+        schema = dict(name='test', tables=iter([orders, users]))
+
+        # foreign keys to members are drawn to the collapsed table
+        index = graph.GraphIndex([orders, users])
+        self.assertEqual(['users'], index.edges['orders'])
+        self.assertEqual([['orders', 'users']], index.components())
+
+        try:
+            fd, output = tempfile.mkstemp()
+            os.close(fd)
+
+            with RestructuredTextWriter(output) as doc:
+                graph.generate_doc(doc, schema)
+
+            content = io.open(output, encoding='utf-8').read()
+            self.assertIn('      orders -> users;\n', content)
+            self.assertNotIn('users_1', content)
+        finally:
+            os.unlink(output)
+
+    def test_split_and_focus(self):
+        datafile = os.path.join(os.path.dirname(__file__),
+                                'yaml/mysql_comments.yaml')
+        try:
+            fd, output = tempfile.mkstemp()
+            os.close(fd)
+
+            graph.main(['-d', datafile, '-o', output, '-s', 'components'])
+            content = io.open(output, encoding='utf-8').read()
+            self.assertEqual(1, content.count('digraph'))
+            self.assertIn('Component 1', content)
+
+            graph.main(['-d', datafile, '-o', output, '--focus', 'items'])
+            content = io.open(output, encoding='utf-8').read()
+            self.assertIn('order_history -> items;', content)
+            self.assertNotIn('users', content)
+        finally:
+            os.unlink(output)
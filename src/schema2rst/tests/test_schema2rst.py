@@ -2,9 +2,11 @@
 
 import io
 import os
+import shutil
 import tempfile
 from mock import patch
 
+from schema2rst import serializers
 from schema2rst.commands import rst
 
 import sys
@@ -39,12 +41,34 @@ class TestSchema2rst(unittest.TestCase):
             rst.parse_option(['-c', 'config.yaml', '-d', 'dump.yaml',
                               '-o', 'output.rst'])
 
+        # invalid --jobs
+        with self.assertRaises(RuntimeError):
+            rst.parse_option(['-c', 'config.yaml', '-j', '0'])
+
+        # invalid --render-jobs
+        with self.assertRaises(RuntimeError):
+            rst.parse_option(['-c', 'config.yaml', '--render-jobs', '0'])
+
+        # --schema with -d
+        with self.assertRaises(RuntimeError):
+            rst.parse_option(['-d', 'dump.yaml', '--schema', 'app'])
+
+        # --previous with multiple schemas
+        with self.assertRaises(RuntimeError):
+            rst.parse_option(['-c', 'config.yaml', '--schema', 'app_*',
+                              '--previous', 'dump.yaml'])
+
         # success (1)
         option, args = rst.parse_option(['-c', 'config.yaml',
                                          '-o', 'output.rst'])
         self.assertEqual('config.yaml', option.config)
         self.assertEqual(None, option.datafile)
         self.assertEqual('output.rst', option.output)
+        self.assertEqual(1, option.jobs)
+        self.assertEqual(1, option.render_jobs)
+        self.assertEqual([], option.schemas)
+        self.assertEqual([], option.include)
+        self.assertEqual([], option.exclude)
         self.assertEqual([], args)
 
         # success (2)
@@ -55,6 +79,16 @@ class TestSchema2rst(unittest.TestCase):
         self.assertEqual('output.rst', option.output)
         self.assertEqual([], args)
 
+        # success (3)
+        option, args = rst.parse_option(['-c', 'config.yaml',
+                                         '--schema', 'app',
+                                         '--schema', 'log_*',
+                                         '--include', 'user*',
+                                         '--exclude', '*_tmp'])
+        self.assertEqual(['app', 'log_*'], option.schemas)
+        self.assertEqual(['user*'], option.include)
+        self.assertEqual(['*_tmp'], option.exclude)
+
     def test_from_datafile_basic(self):
         try:
             fd, output = tempfile.mkstemp()
@@ -80,3 +114,178 @@ class TestSchema2rst(unittest.TestCase):
                              io.open(output, encoding='utf-8').read())
         finally:
             os.unlink(output)
+
+    def test_write_docs_incrementally(self):
+        def table(name, *columns):
+            return dict(name=name, comment='', fields=['name', 'type'],
+                        columns=[dict(name=c, type='int') for c in columns],
+                        indexes=[], foreign_keys=[])
+
+        def mtimes():
+            ret = {}
+            for dirpath, _, filenames in os.walk(basedir):
+                for filename in filenames:
+                    if filename.endswith('.rst'):
+                        path = os.path.join(dirpath, filename)
+                        ret[os.path.relpath(path, basedir)] = \
+                            os.stat(path).st_mtime
+                        os.utime(path, (0, 0))
+
+            return ret
+
+        basedir = tempfile.mkdtemp()
+        try:
+            schema = dict(name='test', tables=[table('items', 'id'),
+                                               table('users', 'id')])
+            rst.write_docs(schema, basedir=basedir)
+            self.assertEqual(['test.rst', 'test/items.rst', 'test/users.rst'],
+                             sorted(mtimes()))
+
+            # nothing changed
+            rst.write_docs(schema, basedir=basedir)
+            self.assertEqual({'test.rst': 0, 'test/items.rst': 0,
+                              'test/users.rst': 0}, mtimes())
+
+            # a column is added to users
+            schema['tables'][1] = table('users', 'id', 'name')
+            rst.write_docs(schema, basedir=basedir)
+            changed = mtimes()
+            self.assertEqual(0, changed['test.rst'])
+            self.assertEqual(0, changed['test/items.rst'])
+            self.assertNotEqual(0, changed['test/users.rst'])
+
+            # items is dropped
+            del schema['tables'][0]
+            rst.write_docs(schema, basedir=basedir)
+            changed = mtimes()
+            self.assertEqual(['test.rst', 'test/users.rst'], sorted(changed))
+            self.assertNotEqual(0, changed['test.rst'])
+            self.assertEqual(0, changed['test/users.rst'])
+
+            # force rewriting
+            rst.write_docs(schema, basedir=basedir, force=True)
+            self.assertNotIn(0, mtimes().values())
+        finally:
+            shutil.rmtree(basedir)
+
+    def test_write_docs_with_render_jobs(self):
+        def table(name):
+            return dict(name=name, comment='', fields=['name', 'type'],
+                        columns=[dict(name='id', type='int')],
+                        indexes=[], foreign_keys=[])
+
+        serial = tempfile.mkdtemp()
+        parallel = tempfile.mkdtemp()
+        try:
+            names = ['table%02d' % i for i in range(10)]
+            schema = dict(name='test', tables=[table(n) for n in names])
+            rst.write_docs(schema, basedir=serial)
+            schema = dict(name='test', tables=(table(n) for n in names))
+            rst.write_docs(schema, basedir=parallel, render_jobs=3)
+
+            for name in ['test.rst'] + [f"test/{n}.rst" for n in names]:
+                with io.open(os.path.join(serial, name)) as f:
+                    expected = f.read()
+                with io.open(os.path.join(parallel, name)) as f:
+                    self.assertEqual(expected, f.read())
+        finally:
+            shutil.rmtree(serial)
+            shutil.rmtree(parallel)
+
+    def test_write_docs_with_links(self):
+        users = dict(name='users', comment='', fields=['name', 'fkey'],
+                     columns=[dict(name='id')], indexes=[], foreign_keys=[])
+        orders = dict(name='orders', comment='', fields=['name', 'fkey'],
+                      columns=[dict(name='id'),
+                               dict(name='user_id', fkey='FK: users.id'),
+                               dict(name='item_id', fkey='FK: items.id')],
+                      indexes=[],
+                      foreign_keys=[dict(name='fk_user',
+                                         constrained_columns=['user_id'],
+                                         referred_table='users',
+                                         referred_columns=['id'])])
+        schema = dict(name='test', tables=iter([orders, users]))
+
+        basedir = tempfile.mkdtemp()
+        try:
+            output = os.path.join(basedir, 'test.rst')
+            rst.write_docs(schema, output)
+            content = io.open(output, encoding='utf-8').read()
+            self.assertIn('     - `users.id <test.users_>`__\n', content)
+            self.assertIn('     - FK: items.id\n', content)
+            self.assertIn('Referenced by\n^^^^^^^^^^^^^\n\n'
+                          '* `test.orders <test.orders_>`__ (user_id)\n',
+                          content)
+
+            schema['tables'] = [orders, users]
+            rst.write_docs(schema, basedir=basedir)
+            path = os.path.join(basedir, 'test', 'orders.rst')
+            content = io.open(path, encoding='utf-8').read()
+            self.assertIn('     - :ref:`users.id <test.users>`\n', content)
+
+            path = os.path.join(basedir, 'test', 'users.rst')
+            content = io.open(path, encoding='utf-8').read()
+            self.assertIn('* :ref:`test.orders <test.orders>` (user_id)\n',
+                          content)
+        finally:
+            shutil.rmtree(basedir)
+
+    def test_write_docs_from_streamed_dump(self):
+        users = dict(name='users', comment='', fields=['name'],
+                     columns=[dict(name='id')], indexes=[], foreign_keys=[])
+        orders = dict(name='orders', comment='', fields=['name', 'fkey'],
+                      columns=[dict(name='user_id', fkey='FK: users.id')],
+                      indexes=[],
+                      foreign_keys=[dict(name='fk_user',
+                                         constrained_columns=['user_id'],
+                                         referred_table='users',
+                                         referred_columns=['id'])])
+
+        basedir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(basedir, 'dump.jsonl')
+            serializers.dump(dict(name='test', tables=[orders, users]), path,
+                             'jsonl')
+
+            # streamed tables are walked twice instead of being loaded
+            schema = serializers.load(path)
+            self.assertIs(schema['tables'], rst.reiterable(schema['tables']))
+            rst.write_docs(schema, basedir=basedir)
+
+            path = os.path.join(basedir, 'test', 'orders.rst')
+            content = io.open(path, encoding='utf-8').read()
+            self.assertIn('     - :ref:`users.id <test.users>`\n', content)
+
+            path = os.path.join(basedir, 'test', 'users.rst')
+            content = io.open(path, encoding='utf-8').read()
+            self.assertIn('* :ref:`test.orders <test.orders>` (user_id)\n',
+                          content)
+        finally:
+            shutil.rmtree(basedir)
+
+    def test_write_docs_with_members(self):
+        events = dict(name='events', comment='', fields=['name', 'fkey'],
+                      columns=[dict(name='id')], indexes=[], foreign_keys=[],
+                      members=['events_2024', 'events_2025'])
+        logs = dict(name='logs', comment='', fields=['name', 'fkey'],
+                    columns=[dict(name='event_id')], indexes=[],
+                    foreign_keys=[dict(name='fk_event',
+                                       constrained_columns=['event_id'],
+                                       referred_table='events_2024',
+                                       referred_columns=['id'])])
+        schema = dict(name='test', tables=[events, logs])
+
+        basedir = tempfile.mkdtemp()
+        try:
+            output = os.path.join(basedir, 'test.rst')
+            rst.write_docs(schema, output)
+            content = io.open(output, encoding='utf-8').read()
+            self.assertIn('Members\n^^^^^^^\n\n'
+                          '2 tables of the same structure:\n\n'
+                          '* events_2024\n* events_2025\n', content)
+            self.assertIn('     - `events_2024.id <test.events_>`__\n',
+                          content)
+            self.assertIn('* `test.logs <test.logs_>`__ (event_id)\n',
+                          content)
+        finally:
+            shutil.rmtree(basedir)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import shutil
+import tempfile
+from mock import patch
+
+from schema2rst.commands import batch
+
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+
+class TestSchemabatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def writefile(self, filename, content):
+        path = os.path.join(self.tmpdir, filename)
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        return path
+
+    @patch("optparse.OptionParser.error")
+    def test_parse_option(self, error):
+        error.side_effect = RuntimeError  # do not output error to stderr
+
+        # no arguments
+        with self.assertRaises(RuntimeError):
+            batch.parse_option([])
+
+        # invalid --processes
+        with self.assertRaises(RuntimeError):
+            batch.parse_option(['-p', '0', 'config.yaml'])
+
+        # missing config file
+        with self.assertRaises(RuntimeError):
+            batch.parse_option([os.path.join(self.tmpdir, 'missing.yaml')])
+
+        # entry of a list without name and db
+        listfile = self.writefile('list.yaml',
+                                  "- {type: mysql, db: logs}\n"
+                                  "- {type: mysql, host: localhost}\n")
+        with self.assertRaises(RuntimeError):
+            batch.parse_option([listfile])
+        error.assert_called_with('%s: entry 2 has neither name nor db' %
+                                 listfile)
+
+        # success
+        config = self.writefile('config.yaml', "type: mysql\ndb: sales\n")
+        configdir = os.path.join(self.tmpdir, 'configs')
+        os.mkdir(configdir)
+        option, args = batch.parse_option(['-o', 'docs', '-p', '2',
+                                           config, configdir])
+        self.assertEqual('docs', option.output_dir)
+        self.assertEqual(2, option.processes)
+        self.assertEqual(1, option.jobs)
+        self.assertEqual([config, configdir], args)
+        self.assertEqual([('config', dict(type='mysql', db='sales'))],
+                         option.configs)
+
+    def test_load_configs(self):
+        configdir = os.path.join(self.tmpdir, 'configs')
+        os.mkdir(configdir)
+        self.writefile('configs/sales.yaml', "type: mysql\ndb: sales\n")
+        self.writefile('configs/users.yaml', "type: mysql\ndb: users\n")
+        self.writefile('configs/README', "not a config\n")
+        listfile = self.writefile('list.yaml',
+                                  "- {type: mysql, db: logs}\n"
+                                  "- {type: mysql, db: logs, name: logs2}\n"
+                                  "- {type: mysql, name: default}\n")
+
+        configs = batch.load_configs([configdir, listfile])
+        self.assertEqual(['sales', 'users', 'logs', 'logs2', 'default'],
+                         [name for name, _ in configs])
+        self.assertEqual('logs', configs[3][1]['db'])
+
+    def test_document(self):
+        schema = dict(name='sample',
+                      tables=[dict(name='users', comment='',
+                                   fields=['name', 'type'],
+                                   columns=[dict(name='id', type='int')],
+                                   indexes=[], foreign_keys=[])])
+
+        with patch('schema2rst.inspectors.create_engine'), \
+                patch('schema2rst.inspectors.create_for') as create_for:
+            create_for.return_value.dump.return_value = schema
+            result = batch.document('db1', {}, self.tmpdir)
+
+        self.assertEqual('ok', result['status'])
+        self.assertEqual(1, result['tables'])
+        basedir = os.path.join(self.tmpdir, 'db1')
+        for filename in ('sample.yaml', 'sample.rst', 'sample/users.rst'):
+            self.assertTrue(os.path.exists(os.path.join(basedir, filename)))
+
+    def test_document_failure(self):
+        with patch('schema2rst.inspectors.create_engine') as create_engine:
+            create_engine.side_effect = ValueError('could not connect')
+            result = batch.document('sample', {}, self.tmpdir)
+
+        self.assertEqual('failed', result['status'])
+        self.assertEqual('ValueError: could not connect', result['error'])
+
+        stream = io.StringIO()
+        batch.print_summary([result], stream)
+        self.assertIn('sample  failed', stream.getvalue())
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import json
+import shutil
+import tempfile
+
+from mock import patch
+from schema2rst.commands import bench
+
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+
+class TestSchemabench(unittest.TestCase):
+    @patch("optparse.OptionParser.error")
+    def test_parse_option(self, error):
+        error.side_effect = RuntimeError  # do not output error to stderr
+
+        with self.assertRaises(RuntimeError):
+            bench.parse_option(['-t', '0'])
+
+        with self.assertRaises(RuntimeError):
+            bench.parse_option(['-b', 'oracle'])
+
+        options, _ = bench.parse_option([])
+        self.assertEqual(['sqlite'], options.backend)
+
+        options, _ = bench.parse_option(['-b', 'mysql', '-b', 'postgresql'])
+        self.assertEqual(['mysql', 'postgresql'], options.backend)
+
+    def test_generate_ddl(self):
+        statements = bench.generate_ddl('mysql', 3, 2, 2)
+        self.assertEqual(6, len(statements))
+        self.assertIn(u"c000 varchar(64) COMMENT '項目0（説明0）'",
+                      statements[0])
+        self.assertIn('fk1 integer REFERENCES t00000(id)', statements[4])
+
+        statements = bench.generate_ddl('postgresql', 1, 2, 0)
+        self.assertIn(u"""COMMENT ON COLUMN t00000.c001 IS '{"unit": """
+                      u'"yen", "pii": false, "seq": 1}\'', statements)
+
+    @patch("sys.stderr", new_callable=io.StringIO)
+    def test_sqlite(self, stderr):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            output = os.path.join(tmpdir, 'report.json')
+            bench.main(['-t', '5', '-m', '3', '-k', '2', '-o', output])
+
+            report = json.load(io.open(output, encoding='utf-8'))
+            self.assertEqual(5, report['parameters']['tables'])
+
+            result = report['results'][0]
+            self.assertEqual('sqlite', result['backend'])
+            self.assertEqual(5, result['tables'])
+            self.assertEqual(sorted(bench.PHASES), sorted(result['phases']))
+            self.assertLess(0, result['phases']['reflect']['queries'])
+            self.assertLess(0, result['phases']['reflect']['peak_memory'])
+            self.assertEqual(0, result['phases']['rst']['queries'])
+            self.assertLess(0, result['phases']['serialize']['size'])
+
+            # --datafile rendering does not import SQLAlchemy
+            startup = result['phases']['startup']
+            self.assertFalse(startup['sqlalchemy_imported'])
+            self.assertTrue(stderr.getvalue().startswith('sqlite'))
+        finally:
+            shutil.rmtree(tmpdir)
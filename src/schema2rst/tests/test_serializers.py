@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import yaml
+import sqlalchemy
+
+from schema2rst import serializers
+
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+try:
+    import msgpack  # NOQA
+except ImportError:
+    msgpack = None
+
+
+class TestSerializers(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.schema = dict(name='test', signatures=dict(items='1'), tables=[
+            dict(name='items', comment=u'商品',
+                 fields=['name', 'type', 'nullable', 'pkey', 'default'],
+                 columns=[dict(name='id', type='int(11)', nullable=False,
+                               pkey=True, default=None)],
+                 indexes=[dict(name='name', unique=True,
+                               column_names=['name'])],
+                 foreign_keys=[]),
+            dict(name='orders', comment='', fields=['name', 'type'],
+                 columns=[dict(name='item_id', type='int(11)')],
+                 indexes=[],
+                 foreign_keys=[dict(name='orders_ibfk_1',
+                                    constrained_columns=['item_id'],
+                                    referred_table='items',
+                                    referred_columns=['id'])]),
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def roundtrip(self, format, filename):
+        path = os.path.join(self.tmpdir, filename)
+        if serializers.FORMATS[format][1]:
+            schema = dict(self.schema, tables=iter(self.schema['tables']))
+        else:
+            schema = self.schema
+        serializers.dump(schema, path, format)
+
+        schema = serializers.load(path)
+        schema['tables'] = list(schema['tables'])
+        return schema
+
+    def test_roundtrip(self):
+        for format in serializers.FORMATS:
+            if format.startswith('msgpack') and msgpack is None:
+                continue
+
+            # format is guessed from the extension or the content
+            for filename in ('dump.%s' % format, 'dump'):
+                self.assertEqual(self.schema,
+                                 self.roundtrip(format, filename),
+                                 (format, filename))
+
+    def test_yaml_uses_libyaml(self):
+        if getattr(yaml, '__with_libyaml__', False):
+            self.assertIs(yaml.CSafeLoader, serializers.BaseLoader)
+            self.assertTrue(issubclass(serializers.SchemaDumper,
+                                       yaml.CSafeDumper))
+
+    def test_column_types(self):
+        schema = dict(name='test', tables=[
+            dict(name='items', columns=[dict(name='id',
+                                             type=sqlalchemy.INTEGER())]),
+        ])
+        for format in ('yaml', 'json'):
+            path = os.path.join(self.tmpdir, 'dump')
+            serializers.dump(schema, path, format)
+            column = serializers.load(path)['tables'][0]['columns'][0]
+            self.assertEqual('INTEGER', column['type'])
+
+    def test_streamed_tables_are_lazy(self):
+        path = os.path.join(self.tmpdir, 'dump.jsonl')
+        serializers.dump(self.schema, path, 'jsonl')
+
+        schema = serializers.load(path)
+        self.assertEqual('test', schema['name'])
+        tables = iter(schema['tables'])
+        self.assertEqual('items', next(tables)['name'])
+        self.assertEqual('orders', next(tables)['name'])
+
+        # the dump is read again on each iteration
+        self.assertEqual(['items', 'orders'],
+                         [t['name'] for t in schema['tables']])
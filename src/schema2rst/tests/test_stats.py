@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import optparse
+import sqlalchemy
+
+from schema2rst import inspectors
+from schema2rst.stats import Stats, add_options
+
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, 'test.db')
+        self.engine = sqlalchemy.create_engine('sqlite:///%s' % path)
+        self.engine.execute("CREATE TABLE users ("
+                            "  id integer PRIMARY KEY,"
+                            "  name varchar(255))")
+        self.engine.execute("CREATE TABLE orders ("
+                            "  id integer PRIMARY KEY,"
+                            "  user_id integer REFERENCES users(id))")
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def test_collect(self):
+        stats = Stats()
+        stats.watch(self.engine)
+        inspector = inspectors.create_for(self.engine)
+        with stats.phase('reflect'):
+            inspector.dump()
+        stats.add_inspector(inspector)
+
+        self.assertEqual(['reflect'], list(stats.phases))
+        self.assertLess(0, stats.queries['count'])
+        self.assertEqual(['orders', 'users'], sorted(stats.tables))
+        self.assertEqual(2, stats.reflection['indexes']['count'])
+        self.assertEqual(1, len(stats.slowest_tables(1)))
+
+        output = io.StringIO()
+        stats.write(output)
+        self.assertIn('slowest tables:', output.getvalue())
+
+        # tables of several schemas do not overwrite each other
+        other = inspectors.create_for(self.engine, 'main')
+        other.dump()
+        stats.add_inspector(other)
+        self.assertEqual(['main.orders', 'main.users', 'orders', 'users'],
+                         sorted(stats.tables))
+
+    def test_report(self):
+        parser = optparse.OptionParser()
+        add_options(parser)
+        path = os.path.join(self.tmpdir, 'stats.json')
+        options, _ = parser.parse_args(['--stats-file', path,
+                                        '--slowest', '1'])
+
+        stats = Stats()
+        stats.tables = dict(users=0.1, orders=0.2, items=0.3)
+        with stats.phase('render'):
+            pass
+        stats.report(options)
+
+        report = json.load(io.open(path, encoding='utf-8'))
+        self.assertEqual(['render'], list(report['phases']))
+        self.assertEqual(3, report['tables'])
+        self.assertEqual([dict(name='items', elapsed=0.3)],
+                         report['slowest_tables'])